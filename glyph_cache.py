@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import time
+from typing import Iterable
+
+DEFAULT_GLYPH_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'glyphs.sqlite3')
+
+# 识别结果来源
+SOURCE_OCR = 'ocr'
+SOURCE_IMAGE = 'image'
+SOURCE_QUICK = 'quick'
+# 来源可信度，较可信来源的结果覆盖较不可信者
+SOURCE_RANK = {SOURCE_IMAGE: 1, SOURCE_QUICK: 2, SOURCE_OCR: 3}
+
+
+class GlyphCache:
+    """
+    跨字体共享的字形级缓存（SQLite）：以字形轮廓哈希（见 lib.get_glyph_outline_hashes）为键，
+    保存识别出的真实字符及其来源（ocr、image 或 quick）。
+    混淆字体常以不同码位复用相同轮廓，命中的字形无需再绘制或 OCR。
+    """
+
+    def __init__(self, path: str = DEFAULT_GLYPH_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        # 多个工作进程同时读写
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS glyphs (
+                outline_hash TEXT PRIMARY KEY,
+                character TEXT NOT NULL,
+                source TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, outline_hashes: Iterable[str]) -> dict[str, tuple[str, str]]:
+        """批量查询，返回 轮廓哈希 -> (字符, 来源)，未命中者不在结果中"""
+        outline_hashes = list(set(h for h in outline_hashes if h is not None))
+        found = {}
+        # SQLite 单条语句参数个数有限，分批查询
+        for start in range(0, len(outline_hashes), 500):
+            chunk = outline_hashes[start:start + 500]
+            rows = self._conn.execute(
+                f'SELECT outline_hash, character, source FROM glyphs '
+                f'WHERE outline_hash IN ({",".join("?" * len(chunk))})',
+                chunk
+            )
+            for outline_hash, character, source in rows:
+                found[outline_hash] = (character, source)
+        return found
+
+    def put_many(self, items: Iterable[tuple[str | None, str, str]]):
+        """
+        批量写入 (轮廓哈希, 字符, 来源)；空轮廓及空结果忽略。
+        已有记录只被更可信的来源（ocr > quick > image）覆盖。
+        """
+        now = time.time()
+        rank = 'CASE {} ' + ' '.join(f"WHEN '{source}' THEN {n}" for source, n in SOURCE_RANK.items()) + ' ELSE 0 END'
+        self._conn.executemany(
+            f'INSERT INTO glyphs VALUES (?, ?, ?, ?) '
+            f'ON CONFLICT(outline_hash) DO UPDATE SET '
+            f'character = excluded.character, source = excluded.source, created = excluded.created '
+            f'WHERE {rank.format("excluded.source")} > {rank.format("glyphs.source")}',
+            [(outline_hash, character, source, now)
+             for outline_hash, character, source in items if outline_hash is not None and character]
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM glyphs').fetchone()[0]
@@ -1,35 +1,174 @@
-import copy
 import hashlib
 import json
-from functools import lru_cache
+import logging
+from functools import cached_property, lru_cache
 import asyncio
+import contextlib
 import io
+import os
+import socket
+import stat
 import tempfile
-from typing import Union
+import threading
+import time
+from typing import IO, Iterable, Iterator, Union
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+import numpy as np
+from fontTools.pens.recordingPen import DecomposingRecordingPen
 from fontTools.ttLib import woff2, ttFont
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+# 按文件头魔数识别字体格式
+FONT_MAGIC = {
+    b'wOF2': 'woff2',
+    b'wOFF': 'woff',
+    b'\x00\x01\x00\x00': 'ttf',
+    b'true': 'ttf',
+    b'OTTO': 'otf',
+}
+
+
+def sniff_font_format(font_bytes: bytes) -> str:
+    """按文件头魔数识别 WOFF/WOFF2/TTF/OTF"""
+    font_format = FONT_MAGIC.get(font_bytes[:4])
+    if font_format is None:
+        raise ValueError("Unsupported font format. Please provide a WOFF, WOFF2, TTF, or OTF file.")
+    return font_format
+
+
+def web_font_to_sfnt_bytes(input_bytest: bytes) -> bytes:
+    """将 woff/woff2 bytes 在内存中解压为 TTF/OTF bytes，不经过临时文件"""
+    with io.BytesIO(input_bytest) as input_file:
+        output_file = io.BytesIO()
+        woff2.decompress(input_file, output_file)
+        return output_file.getvalue()
+
 
 def woff2_to_ttf(input_bytest: bytes):
     """将 woff2 bytes 转捣为 TTFont 对象"""
-    with io.BytesIO(input_bytest) as input_file:
-        with tempfile.TemporaryFile() as tmp:
-            woff2.decompress(input_file, tmp)
-            tmp.seek(0)
-            ttf = ttFont.TTFont(tmp)
-            return ttf
-
-
-async def get_font(font_path: str) -> dict[str, Union[str, bytes, ttFont.TTFont]]:
-    font_bytes = await asyncio.to_thread(lambda: open(font_path, 'rb').read())
-    m = hashlib.sha1()
-    m.update(font_bytes)
-    hashsum = m.hexdigest()
-    # 取font_path文件名作为字体名
-    font_name = font_path.split('/')[-1].split('.')[0]
+    return ttFont.TTFont(io.BytesIO(web_font_to_sfnt_bytes(input_bytest)), lazy=True)
+
+
+def _canonical_number(v):
+    v = round(float(v), 3)
+    return int(v) if v.is_integer() else v
+
+
+def _get_glyph_outline_hash(glyph_set, glyph_name: str, units_per_em: int) -> str | None:
+    # 展开复合字形的组件，哈希只依赖轮廓本身，与组件字形名无关
+    pen = DecomposingRecordingPen(glyph_set)
+    glyph_set[glyph_name].draw(pen)
+    if not pen.value:
+        return None
+    outline = [units_per_em] + [
+        (op, [tuple(_canonical_number(v) for v in pt) for pt in args]) for op, args in pen.value
+    ]
+    return hashlib.sha1(repr(outline).encode('utf-8')).hexdigest()
+
+
+def get_glyph_outline_hashes(ttf: ttFont.TTFont, characters: Iterable[str]) -> dict[str, str | None]:
+    """
+    求出各字符字形轮廓（glyf 或 CFF，复合字形展开为轮廓）的规范哈希，与码位及字形名无关，可跨字体比较。
+    轮廓为空（如空格）或无法绘制的字符返回 None。
+    """
+    cmap = ttf.getBestCmap()
+    glyph_set = ttf.getGlyphSet()
+    units_per_em = ttf['head'].unitsPerEm
+    hashes = {}
+    for character in characters:
+        glyph_name = cmap.get(ord(character))
+        try:
+            hashes[character] = _get_glyph_outline_hash(glyph_set, glyph_name, units_per_em) \
+                if glyph_name is not None else None
+        except Exception as e:
+            # 单个损坏的字形不应导致整个字体失败
+            logger.debug("Cannot hash outline of %r (%s): %s", character, glyph_name, e)
+            hashes[character] = None
+    return hashes
+
+
+class LoadedFont:
+    """
+    统一的字体载入层，供 quick、slow 及 OCR 各流程共用同一份解析结果。
+    接受 bytes、路径或文件对象；按魔数识别格式，web 字体只在内存中解压一次；
+    TTFont、cmap、字形顺序及各字号的 Pillow 字体均在首次使用时创建并缓存。
+    """
+
+    def __init__(self, source: Union[bytes, str, os.PathLike, IO[bytes]], name: str | None = None):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            font_bytes = bytes(source)
+        elif isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                font_bytes = f.read()
+            if name is None:
+                # 取font_path文件名作为字体名
+                name = os.path.basename(os.fspath(source)).split('.')[0]
+        else:
+            font_bytes = source.read()
+        self.name = name
+        self.bytes = font_bytes
+        self.format = sniff_font_format(font_bytes)
+        if self.format in ('woff', 'woff2'):
+            self.sfnt_bytes = web_font_to_sfnt_bytes(font_bytes)
+        else:
+            self.sfnt_bytes = font_bytes
+        self._pil_fonts = {}
+
+    @cached_property
+    def hashsum(self) -> str:
+        """原始字体文件的 sha1"""
+        return hashlib.sha1(self.bytes).hexdigest()
+
+    @cached_property
+    def ttf(self) -> ttFont.TTFont:
+        return ttFont.TTFont(io.BytesIO(self.sfnt_bytes), lazy=True)
+
+    @cached_property
+    def cmap(self) -> dict[int, str]:
+        """最佳 cmap 子表：码位 -> 字形名"""
+        return self.ttf.getBestCmap()
+
+    @cached_property
+    def glyph_order(self) -> list[str]:
+        return self.ttf.getGlyphOrder()
+
+    @cached_property
+    def characters(self) -> list[str]:
+        """全部 cmap 子表所含字符，按码位排序"""
+        codes = set()
+        for table in self.ttf['cmap'].tables:
+            codes.update(table.cmap.keys())
+        return [chr(code) for code in sorted(codes)]
+
+    @cached_property
+    def outline_hashes(self) -> dict[str, str | None]:
+        """全部字符的字形轮廓哈希，见 get_glyph_outline_hashes"""
+        return get_glyph_outline_hashes(self.ttf, self.characters)
+
+    def pil_font(self, size: int) -> ImageFont.FreeTypeFont:
+        """指定字号的 Pillow 字体，与 TTFont 共用同一份内存数据"""
+        pil_font = self._pil_fonts.get(size)
+        if pil_font is None:
+            pil_font = ImageFont.truetype(io.BytesIO(self.sfnt_bytes), size)
+            # 供渲染缓存使用，免去再次求哈希
+            pil_font.content_hash = self.hashsum
+            self._pil_fonts[size] = pil_font
+        return pil_font
+
+
+async def get_font(font_path: str) -> dict[str, Union[str, bytes, ttFont.TTFont, LoadedFont]]:
+    font = await asyncio.to_thread(LoadedFont, font_path)
     return {
-        "name": font_name,
-        "bytes": font_bytes,
-        "ttf": woff2_to_ttf(font_bytes),
-        "hashsum": hashsum,
+        "name": font.name,
+        "bytes": font.bytes,
+        "ttf": font.ttf,
+        "hashsum": font.hashsum,
+        "font": font,
     }
 
 
@@ -51,6 +190,265 @@ def load_std_font_coord_table(COORD_TABLE_PATH) -> list[
         return sorted(_t, key=lambda x: x[0])
 
 
+class CoorTable:
+    """
+    CSR 形式的 coordTable：全部字符的点坐标拼接为一个 (总点数, 2) int32 数组，
+    offsets[i]:offsets[i + 1] 为第 i 个字符的点。
+    """
+
+    def __init__(self, chars: list[str], coords: np.ndarray, offsets: np.ndarray):
+        self.chars = chars
+        self.coords = coords
+        self.offsets = offsets
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[str, Iterable]]) -> 'CoorTable':
+        chars = []
+        arrays = []
+        for char, coords in items:
+            chars.append(char)
+            arrays.append(np.asarray(coords, dtype=np.int32).reshape(-1, 2))
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        coords = np.concatenate(arrays) if arrays else np.empty((0, 2), dtype=np.int32)
+        return cls(chars, coords, offsets)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def point_counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @cached_property
+    def point_count_groups(self) -> dict[int, np.ndarray]:
+        """点数索引：点数 -> 该点数字符的下标（升序）"""
+        point_counts = self.point_counts
+        order = np.argsort(point_counts, kind='stable')
+        values, starts = np.unique(point_counts[order], return_index=True)
+        ends = [*starts[1:], len(order)]
+        return {int(n): order[start:end] for n, start, end in zip(values, starts, ends)}
+
+    def stack(self, idx: np.ndarray, n: int) -> np.ndarray:
+        """将点数均为 n 的若干字符坐标取出为 (len(idx), n, 2) 数组"""
+        return self.coords[self.offsets[idx][:, np.newaxis] + np.arange(n)]
+
+    def items(self):
+        for i, char in enumerate(self.chars):
+            yield char, self[i]
+
+
+@lru_cache
+def _get_new_file_mode(directory: str) -> int:
+    """
+    在 directory 中以 0666 新建文件实际得到的权限（已扣除 umask 及目录默认 ACL）。
+    新建一个探测文件读取其权限，不临时改动进程的 umask，以免影响其他线程新建的文件。
+    """
+    probe_path = os.path.join(directory, f".mode.{os.getpid()}.{threading.get_ident()}.{time.time_ns()}.tmp")
+    fd = os.open(probe_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        return stat.S_IMODE(os.fstat(fd).st_mode)
+    finally:
+        os.close(fd)
+        os.remove(probe_path)
+
+
+def _get_file_mode(path: str) -> int:
+    """
+    mkstemp 创建的文件权限为 0600，替换前改为此权限，以便共享卷上其他用户读取：
+    目标文件已存在时沿用其权限，否则为普通新建文件的权限
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return _get_new_file_mode(os.path.dirname(os.path.abspath(path)))
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = 'w', **kwargs) -> Iterator[IO]:
+    """
+    先写入同目录下的临时文件，成功后以 os.replace 原子替换目标文件。
+    读者只会看到旧文件或完整的新文件；已 mmap 旧文件的进程不受影响。
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _get_file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+class FileLock:
+    """
+    跨进程互斥锁。
+    有 fcntl 时对锁文件加 flock：持有者退出时由内核释放，不存在失效锁，锁文件保留不删除。
+    否则以 O_CREAT | O_EXCL 创建锁文件，记录主机名及进程号；同一主机上持有者已退出，
+    或锁文件超过 stale_after 秒未释放，即视为失效，先原子改名再复核后移除，避免误删他人新建的锁。
+    """
+
+    def __init__(self, path: str, timeout: float | None = None, poll_interval: float = 0.5,
+                 stale_after: float = 3600):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._owner = f"{socket.gethostname()} {os.getpid()}"
+        self._fd: int | None = None
+
+    def _try_acquire(self) -> bool:
+        if fcntl is not None:
+            fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            return True
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            self._break_stale_lock()
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(self._owner)
+        return True
+
+    def _read_lock(self, path: str) -> tuple[list[str], float] | None:
+        try:
+            with open(path, 'r') as f:
+                owner = f.read().split()
+            return owner, os.path.getmtime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _is_stale(self, lock: tuple[list[str], float]) -> bool:
+        owner, mtime = lock
+        if time.time() - mtime > self.stale_after:
+            return True
+        if len(owner) == 2 and owner[0] == socket.gethostname() and os.name == 'posix':
+            try:
+                os.kill(int(owner[1]), 0)
+            except ProcessLookupError:
+                return True
+            except (PermissionError, ValueError):
+                pass
+        return False
+
+    def _break_stale_lock(self):
+        lock = self._read_lock(self.path)
+        if lock is None or not self._is_stale(lock):
+            return
+        # 原子改名后只有一个进程拿到该文件；复核改名得到的正是判定失效的那个锁
+        stale_path = f"{self.path}.{self._owner.replace(' ', '.')}.{time.time_ns()}.stale"
+        try:
+            os.rename(self.path, stale_path)
+        except FileNotFoundError:
+            return
+        if self._read_lock(stale_path) == lock:
+            os.remove(stale_path)
+            return
+        # 检查与改名之间锁已被他人重新创建，归还原处（目标已存在时不覆盖）
+        try:
+            os.link(stale_path, self.path)
+        except FileExistsError:
+            logger.warning("Lock %s was replaced while breaking a stale lock", self.path)
+        os.remove(stale_path)
+
+    def acquire(self):
+        start = time.monotonic()
+        waiting = False
+        while not self._try_acquire():
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise TimeoutError(f"Timed out waiting for lock {self.path}")
+            if not waiting:
+                logger.info("Waiting for lock %s", self.path)
+                waiting = True
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        if self._fd is not None:
+            # 保留锁文件：删除后其他进程可能锁住另一个同名新文件
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _get_compiled_coord_table_path(COORD_TABLE_PATH) -> str:
+    return os.path.splitext(COORD_TABLE_PATH)[0] + '.compiled.npz'
+
+
+def compile_std_font_coord_table(COORD_TABLE_PATH) -> CoorTable:
+    """
+    将 coorTable.json 编译为 CSR 形式的二进制文件（不压缩 npz），
+    同时保存点数索引及源 JSON 的 sha1，供 load_compiled_std_font_coord_table 校验。
+    """
+    with open(COORD_TABLE_PATH, 'rb') as f:
+        source = f.read()
+    table = CoorTable.from_items(sorted(json.loads(source), key=lambda x: x[0]))
+    groups = table.point_count_groups
+    # 多个进程可能同时编译，原子替换保证读者不会读到写了一半的文件
+    with atomic_write(_get_compiled_coord_table_path(COORD_TABLE_PATH), 'wb') as f:
+        np.savez(
+            f,
+            source_sha1=np.array(hashlib.sha1(source).hexdigest()),
+            chars=np.array(table.chars),
+            coords=table.coords,
+            offsets=table.offsets,
+            point_count_values=np.array(list(groups.keys()), dtype=np.int64),
+            point_count_order=np.concatenate(list(groups.values())) if groups else np.empty(0, np.int64),
+        )
+    return table
+
+
+@lru_cache
+def _load_compiled_std_font_coord_table(COORD_TABLE_PATH, _mtime_ns: int, _size: int) -> CoorTable:
+    compiled_path = _get_compiled_coord_table_path(COORD_TABLE_PATH)
+    if os.path.exists(compiled_path):
+        with open(COORD_TABLE_PATH, 'rb') as f:
+            source_sha1 = hashlib.sha1(f.read()).hexdigest()
+        with np.load(compiled_path) as compiled:
+            if str(compiled['source_sha1']) == source_sha1:
+                table = CoorTable(compiled['chars'].tolist(), compiled['coords'], compiled['offsets'])
+                # 直接使用预先建立的点数索引
+                order = compiled['point_count_order']
+                values = compiled['point_count_values']
+                starts = np.searchsorted(table.point_counts[order], values)
+                ends = [*starts[1:], len(order)]
+                table.point_count_groups = {
+                    int(n): order[start:end] for n, start, end in zip(values, starts, ends)
+                }
+                return table
+    # 编译文件不存在或 JSON 已变化，重新编译
+    return compile_std_font_coord_table(COORD_TABLE_PATH)
+
+
+def load_compiled_std_font_coord_table(COORD_TABLE_PATH) -> CoorTable:
+    """载入预编译的标准 coordTable（按字符排序），每个进程缓存；JSON 变化时自动重新编译"""
+    stat = os.stat(COORD_TABLE_PATH)
+    return _load_compiled_std_font_coord_table(COORD_TABLE_PATH, stat.st_mtime_ns, stat.st_size)
+
+
 def is_coor_match(x, y) -> bool:
     """比较 coor"""
 
@@ -69,28 +467,48 @@ def is_coor_match(x, y) -> bool:
         return False
 
 
+def _coor_key(item) -> tuple[str, tuple[tuple[int, int], ...]]:
+    """coordTable 条目的可哈希键：与 is_coor_match 判等一致"""
+    return item[0], tuple(tuple(point) for point in item[1])
+
+
 def merge_coor_table(source, target):
-    source_copy = copy.copy(source)
-    for j in source:
-        for k in target:
-            if j[0] == k[0] and is_coor_match(j[1], k[1]):
-                source_copy.remove(j)
+    """将 source 中 target 未包含的条目并入 target，按字符排序"""
+    target_keys = set(map(_coor_key, target))
+    source_copy = [j for j in source if _coor_key(j) not in target_keys]
     return sorted([*target, *source_copy], key=lambda x: x[0])
 
 
+def merge_coor_tables(target, sources: Iterable) -> list:
+    """
+    依次将多个 coordTable 并入 target，结果与逐个调用 merge_coor_table 相同。
+    sources 可为生成器，逐个读入各字体的 coordTable，无需同时载入内存。
+    """
+    keys = set(map(_coor_key, target))
+    merged = list(target)
+    for source in sources:
+        source_copy = []
+        source_keys = []
+        for j in source:
+            key = _coor_key(j)
+            if key not in keys:
+                source_copy.append(j)
+                source_keys.append(key)
+        keys.update(source_keys)
+        merged.extend(source_copy)
+    # 稳定排序，相同字符保持并入先后顺序
+    return sorted(merged, key=lambda x: x[0])
+
+
 def deduplicate_coor_table(source: list):
-    rm_list = []
-    source_length = len(source)
-    for j in range(source_length):
-        for k in range(source_length):
-            if j > k and \
-                    source[j][0] == source[k][0] and is_coor_match(source[j][1], source[k][1]):
-                if k not in rm_list:
-                    rm_list.append(k)
+    """移除重复条目，仅保留每组重复条目中最后一个"""
+    last_index = {}
+    for index, value in enumerate(source):
+        last_index[_coor_key(value)] = index
 
     target = []
     for index, value in enumerate(source):
-        if index not in rm_list:
+        if last_index[_coor_key(value)] == index:
             target.append(value)
 
     return target
@@ -0,0 +1,48 @@
+import logging
+import time
+from collections import Counter
+
+# 逐字符日志所用 logger 的名称前缀；默认只输出 WARNING 以上，逐字符 DEBUG 日志需显式开启
+GLYPH_LOGGER = 'glyphs'
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s'
+
+
+def get_glyph_logger(name: str) -> logging.Logger:
+    """模块的逐字符 logger，如 get_glyph_logger(__name__)"""
+    return logging.getLogger(f'{GLYPH_LOGGER}.{name}')
+
+
+def configure_logging(level: str | int = logging.INFO, glyph_details: bool = False):
+    """配置根 logger；glyph_details 为 True 时输出逐字符日志"""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    logging.getLogger().setLevel(level)
+    logging.getLogger(GLYPH_LOGGER).setLevel(logging.DEBUG if glyph_details else logging.WARNING)
+
+
+class GlyphSummary:
+    """
+    按字体汇总逐字符事件（OCR 成功、低置信度、回退匹配等）的计数。
+    处理过程中至多每 interval 秒输出一次进度汇总，结束时由 flush 输出总计，
+    以替代逐字符输出。
+    """
+
+    def __init__(self, logger: logging.Logger, font_name: str, interval: float = 10.0):
+        self.logger = logger
+        self.font_name = font_name
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self._last_emit = time.monotonic()
+
+    def record(self, event: str, n: int = 1):
+        self.counts[event] += n
+        now = time.monotonic()
+        if now - self._last_emit >= self.interval:
+            self._last_emit = now
+            self.logger.info("%s: progress %s", self.font_name, self._format())
+
+    def _format(self) -> str:
+        return ", ".join(f"{event}={n}" for event, n in sorted(self.counts.items()))
+
+    def flush(self):
+        self.logger.info("%s: summary %s", self.font_name, self._format())
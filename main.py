@@ -1,59 +1,198 @@
+import argparse
+import hashlib
 import json
+import logging
+import multiprocessing
 import os
 import asyncio
-from paddle_ocr_extractor import extract_characters_unified_workflow # Import the unified function
-from slow import load_Font, load_std_guest_range, init_true_font
-from commonly_used_character import character_list_7000 as character_list
+from concurrent.futures import ProcessPoolExecutor
+from paddle_ocr_extractor import extract_characters_unified_workflow, get_ocr_pipeline, UNIFIED_WORKFLOW_VERSION # Import the unified function
+from glyph_cache import DEFAULT_GLYPH_CACHE_PATH, GlyphCache
+from lib import atomic_write
+from logging_config import configure_logging
+from metrics import WorkflowMetrics, metrics_to_prometheus
+from result_cache import DEFAULT_CACHE_PATH, ResultCache
+from render_cache import DEFAULT_MAX_BYTES as DEFAULT_RENDER_CACHE_BYTES
+from slow import load_Font, _get_std_guest_range, init_true_font, render_cache, StandardFontBank
 
-async def main():
+TRUE_FONT_PATH = os.path.join(os.path.dirname(__file__), 'true_font')
+COORD_TABLE_PATH = os.path.join(TRUE_FONT_PATH, 'coorTable.json')
+true_font = ["Microsoft-YaHei",
+             "SourceHanSansSC-Normal",
+             "SourceHanSansSC-Regular",
+             "Founder-Lanting"]
+
+# 影响识别结果的参数，同时作为结果缓存键的一部分
+WORKFLOW_PARAMS = {
+    "batch_size": 16,
+    "tile_columns": None,
+    "recognition_only": True,
+}
+
+logger = logging.getLogger(__name__)
+
+# 每个工作进程只载入一次的标准字体集合
+_worker_state = {}
+
+
+def load_std_font_dict():
+    std_font_dict = {}
+    for font_name in true_font:
+        std_font_dict[font_name] = load_Font(
+            os.path.join(TRUE_FONT_PATH, font_name + '.otf')
+        )
+    return std_font_dict
+
+
+def _init_worker(glyph_cache_path: str | None = DEFAULT_GLYPH_CACHE_PATH,
+                 render_cache_bytes: int = DEFAULT_RENDER_CACHE_BYTES, packed_render_cache: bool = False,
+                 log_level: str = 'INFO', glyph_log: bool = False):
+    """工作进程初始化：载入标准字体位图缓存（mmap 共享）、打开字形缓存并创建 OCR 流水线，每个进程只做一次"""
+    configure_logging(log_level, glyph_log)
+    get_ocr_pipeline()
+    render_cache.configure(max_bytes=render_cache_bytes, packed=packed_render_cache)
+    # 排序以使候选顺序不受各进程字符串哈希种子影响，平分时结果可复现
+    guest_range = _get_std_guest_range(COORD_TABLE_PATH)
+    _worker_state['std_font_bank'] = StandardFontBank.from_cache(true_font, TRUE_FONT_PATH, guest_range)
+    _worker_state['glyph_cache'] = GlyphCache(glyph_cache_path) if glyph_cache_path is not None else None
+
+
+def _process_font(full_font_path, fallback_workers=1):
+    """识别单个字体，返回识别结果及各阶段计时"""
+    metrics = WorkflowMetrics()
+    # Run unified workflow (PaddleOCR + fallback for failed characters only)
+    result = extract_characters_unified_workflow(
+        full_font_path,
+        fallback_workers=fallback_workers,
+        std_font_bank=_worker_state['std_font_bank'],
+        glyph_cache=_worker_state['glyph_cache'],
+        metrics=metrics,
+        **WORKFLOW_PARAMS,
+        #10  # Limit to first 10 characters for testing
+    )
+    logger.info("Render cache: %s", render_cache.stats())
+    return result, {**metrics.to_dict(), "render_cache": render_cache.stats()}
+
+
+def _save_result(GEN_DIR, sample_font_filename, unified_result):
+    with open(os.path.join(GEN_DIR, sample_font_filename + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(unified_result, f)
+    logger.info("Saved unified workflow output to %s", os.path.join(GEN_DIR, sample_font_filename + '.json'))
+
+
+def _save_metrics(GEN_DIR, sample_font_filename, metrics):
+    """各阶段计时与逐字符耗时直方图，与识别结果并列保存为 <字体>.metrics.json"""
+    with open(os.path.join(GEN_DIR, sample_font_filename + '.metrics.json'), 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2)
+
+
+def _get_cache_params():
+    return {**WORKFLOW_PARAMS, "true_font": true_font}
+
+
+async def main(workers: int = 1, fallback_workers: int = 1, cache: ResultCache | None = None,
+               glyph_cache_path: str | None = DEFAULT_GLYPH_CACHE_PATH,
+               render_cache_bytes: int = DEFAULT_RENDER_CACHE_BYTES, packed_render_cache: bool = False,
+               log_level: str = 'INFO', glyph_log: bool = False, metrics_path: str | None = None):
     # 获取 sample_font文件夹下所有文件的路径
     sample_font_path = os.path.join(os.path.dirname(__file__), 'sample_font')
     sample_font_list = os.listdir(sample_font_path)
-    TRUE_FONT_PATH = os.path.join(os.path.dirname(__file__), 'true_font')
 
-    COORD_TABLE_PATH = os.path.join(TRUE_FONT_PATH, 'coorTable.json')
     GEN_DIR = os.path.join(os.path.dirname(__file__), 'gen')
-    true_font = ["Microsoft-YaHei",
-                 "SourceHanSansSC-Normal",
-                 "SourceHanSansSC-Regular",
-                 "Founder-Lanting"]
     if not os.path.exists(GEN_DIR):
         os.makedirs(GEN_DIR)
 
     # Unified workflow: PaddleOCR first, then fallback for failed characters only
-    print("\n--- Running unified workflow (PaddleOCR + targeted fallback) ---")
-    
-    # Set up fallback parameters (same as used in image similarity method)
-    std_font_dict = {}
-    for font_name in true_font:
-        std_font_dict[font_name] = load_Font(
-            os.path.join(TRUE_FONT_PATH, font_name + '.otf')
-        )
-    init_true_font(std_font_dict, TRUE_FONT_PATH, COORD_TABLE_PATH)
-    guest_range = list(
-        {*load_std_guest_range(COORD_TABLE_PATH), *character_list})
-    
-    for sample_font_filename in sample_font_list:
-        print(f'Processing {sample_font_filename} with unified workflow')
-        full_font_path = os.path.join(sample_font_path, sample_font_filename)
-        try:
-            # Run unified workflow (PaddleOCR + fallback for failed characters only)
-            unified_result = await asyncio.to_thread(
-                extract_characters_unified_workflow, 
-                full_font_path, 
-                std_font_dict, 
-                guest_range, 
-                TRUE_FONT_PATH,
-                #10  # Limit to first 10 characters for testing
-            )
-            with open(os.path.join(GEN_DIR, sample_font_filename + '.json'), 'w', encoding='utf-8') as f:
-                json.dump(unified_result, f)
-            print(f"Saved unified workflow output to {os.path.join(GEN_DIR, sample_font_filename + '.json')}")
-        except Exception as e:
-            print(f"Error processing {sample_font_filename} with unified workflow: {e}")
-            import traceback
-            traceback.print_exc()
+    logger.info("--- Running unified workflow (PaddleOCR + targeted fallback) ---")
+
+    # 在主进程中生成标准字体缓存，避免各工作进程重复生成
+    init_true_font(load_std_font_dict(), TRUE_FONT_PATH, COORD_TABLE_PATH, workers=workers)
+
+    loop = asyncio.get_running_loop()
+    # 以 spawn 启动工作进程：fork 已初始化 Paddle/OpenMP/CUDA 的进程可能死锁，各进程自行载入模型
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker,
+                             initargs=(glyph_cache_path, render_cache_bytes, packed_render_cache,
+                                       log_level, glyph_log)) as pool:
+        tasks = {}
+        hashsums = {}
+        for sample_font_filename in sample_font_list:
+            full_font_path = os.path.join(sample_font_path, sample_font_filename)
+            if cache is not None:
+                with open(full_font_path, 'rb') as f:
+                    hashsums[sample_font_filename] = hashlib.sha1(f.read()).hexdigest()
+                # 相同字体已识别过，直接使用缓存结果
+                cached = cache.get(hashsums[sample_font_filename], UNIFIED_WORKFLOW_VERSION, _get_cache_params())
+                if cached is not None:
+                    _save_result(GEN_DIR, sample_font_filename, cached)
+                    logger.info("Cache hit for %s", sample_font_filename)
+                    continue
+            logger.info('Processing %s with unified workflow', sample_font_filename)
+            task = loop.run_in_executor(pool, _process_font, full_font_path, fallback_workers)
+            tasks[task] = sample_font_filename
+
+        # 每个字体完成后立即写出结果
+        metrics_by_font = {}
+        pending = set(tasks.keys())
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                sample_font_filename = tasks[task]
+                try:
+                    unified_result, metrics = task.result()
+                    _save_result(GEN_DIR, sample_font_filename, unified_result)
+                    _save_metrics(GEN_DIR, sample_font_filename, metrics)
+                    metrics_by_font[sample_font_filename] = metrics
+                    if cache is not None:
+                        cache.put(hashsums[sample_font_filename], UNIFIED_WORKFLOW_VERSION,
+                                  _get_cache_params(), unified_result)
+                except Exception:
+                    logger.exception("Error processing %s with unified workflow", sample_font_filename)
+
+    if metrics_path is not None and metrics_by_font:
+        # Prometheus 文本格式，供 node_exporter textfile collector 等读取，原子替换避免读到半个文件
+        with atomic_write(metrics_path, 'w', encoding='utf-8') as f:
+            f.write(metrics_to_prometheus(metrics_by_font))
+        logger.info("Saved metrics for %d fonts to %s", len(metrics_by_font), metrics_path)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Decode obfuscated fonts in sample_font into gen/*.json")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Number of worker processes, one font per process at a time")
+    parser.add_argument('--fallback-workers', type=int, default=1,
+                        help="Threads per font for the image-similarity fallback phase")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Decode every font even if a cached result exists")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help="SQLite result cache file")
+    parser.add_argument('--no-glyph-cache', action='store_true',
+                        help="Do not reuse glyphs resolved in other fonts")
+    parser.add_argument('--glyph-cache-path', default=DEFAULT_GLYPH_CACHE_PATH,
+                        help="SQLite glyph cache file, keyed by outline hash")
+    parser.add_argument('--render-cache-mb', type=float, default=DEFAULT_RENDER_CACHE_BYTES / 1024 / 1024,
+                        help="Upper bound of the per-process glyph image cache")
+    parser.add_argument('--packed-render-cache', action='store_true',
+                        help="Keep cached glyph images bit-packed, about 1/8 of the memory")
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="Log level; per-font summaries are logged at INFO")
+    parser.add_argument('--glyph-log', action='store_true',
+                        help="Also log one line per glyph (OCR and fallback outcomes)")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="Also write per-stage timings of all decoded fonts to this Prometheus text file")
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.glyph_log)
+    glyph_cache_path = None if args.no_glyph_cache else args.glyph_cache_path
+    worker_options = {
+        "render_cache_bytes": int(args.render_cache_mb * 1024 * 1024),
+        "packed_render_cache": args.packed_render_cache,
+        "log_level": args.log_level,
+        "glyph_log": args.glyph_log,
+        "metrics_path": args.metrics_prom,
+    }
+    if args.no_cache:
+        asyncio.run(main(args.workers, args.fallback_workers, glyph_cache_path=glyph_cache_path,
+                         **worker_options))
+    else:
+        with ResultCache(args.cache_path) as cache:
+            asyncio.run(main(args.workers, args.fallback_workers, cache, glyph_cache_path,
+                             **worker_options))
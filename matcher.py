@@ -0,0 +1,247 @@
+from functools import cached_property
+
+import numpy as np
+
+from exception import ImageMatchError
+
+# 跳过黑色比例相较测试字符自身差异超过该比例的标准字符
+BLACK_RATE_TOLERANCE = 0.2
+# 低分辨率签名边长，用于粗筛候选字符
+SIGNATURE_SIZE = 8
+
+
+def pack_black_bits(arrays: np.ndarray) -> np.ndarray:
+    """
+    将 (..., H, W) 布尔图像（白色为 True）的黑色像素按位打包为 uint64 字。
+    末尾不足 64 位的部分以 0 填充，不影响共同黑色像素计数。
+    """
+    arrays = np.asarray(arrays, dtype=bool)
+    black = ~arrays.reshape(*arrays.shape[:-2], -1)
+    packed = np.packbits(black, axis=-1)
+    pad = -packed.shape[-1] % 8
+    if pad:
+        packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, pad)])
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """按行统计打包数组中置位的比特数"""
+    return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+
+
+def downsample_signature(bits: np.ndarray, shape: tuple[int, int], size: int = SIGNATURE_SIZE,
+                         chunk: int = 512) -> np.ndarray:
+    """
+    由打包后的黑色像素图求出 size x size 的低分辨率签名，
+    每格为该区域黑色像素所占比例。
+    """
+    height, width = shape
+    ys = np.linspace(0, height, size + 1).astype(np.intp)
+    xs = np.linspace(0, width, size + 1).astype(np.intp)
+    areas = np.outer(np.diff(ys), np.diff(xs)).reshape(-1).astype(np.float32)
+    bits = bits.reshape(-1, bits.shape[-1])
+    out = np.empty((len(bits), size * size), dtype=np.float32)
+    # 分块解包，避免一次性展开整个字体
+    for start in range(0, len(bits), chunk):
+        block = np.unpackbits(bits[start:start + chunk].view(np.uint8), axis=1, count=height * width)
+        block = block.reshape(-1, height, width)
+        block = np.add.reduceat(block, ys[:-1], axis=1, dtype=np.uint16)
+        block = np.add.reduceat(block, xs[:-1], axis=2, dtype=np.uint16)
+        out[start:start + chunk] = block.reshape(len(block), -1) / areas
+    return out
+
+
+class StackedFont:
+    """将单个标准字体的全部字符图像按位打包为连续 (N, words) 数组，便于一次性批量比较"""
+
+    def __init__(self, chars: list[str], bits: np.ndarray, shape: tuple[int, int],
+                 black_point_rates: dict[str, float]):
+        self.chars: list[str] = list(chars)
+        self.index: dict[str, int] = {c: i for i, c in enumerate(self.chars)}
+        self.shape: tuple[int, int] = tuple(shape)
+        self.bits = bits
+        self.black_counts = popcount(bits)
+        self.black_point_rates = np.array([black_point_rates[c] for c in self.chars], dtype=np.float64)
+        self._guest_rows: dict[tuple[str, ...], tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self):
+        return len(self.chars)
+
+    def guest_rows(self, guest_range: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        返回 guest_range 中存在于本字体的字符下标、其在堆叠数组中的行号及黑色比例，
+        均按黑色比例升序排列，以便二分查找黑色比例区间。
+        """
+        key = tuple(guest_range)
+        rows = self._guest_rows.get(key)
+        if rows is None:
+            guest_idx = []
+            font_rows = []
+            for i, text in enumerate(key):
+                row = self.index.get(text)
+                if row is not None:
+                    guest_idx.append(i)
+                    font_rows.append(row)
+            guest_idx = np.array(guest_idx, dtype=np.intp)
+            font_rows = np.array(font_rows, dtype=np.intp)
+            rates = self.black_point_rates[font_rows]
+            order = np.argsort(rates, kind='stable')
+            rows = (guest_idx[order], font_rows[order], rates[order])
+            self._guest_rows[key] = rows
+        return rows
+
+    @staticmethod
+    def rate_candidates(guest_rows: tuple[np.ndarray, np.ndarray, np.ndarray],
+                        test_im_black_point_rate: float) -> tuple[np.ndarray, np.ndarray]:
+        """在 guest_rows 中二分查找黑色比例与测试字符相差不超过 BLACK_RATE_TOLERANCE 的候选字符"""
+        guest_idx, rows, rates = guest_rows
+        # 区间端点略微放宽以容纳浮点误差，再对区间内元素做精确判断
+        lo = np.searchsorted(rates, test_im_black_point_rate * (1 - BLACK_RATE_TOLERANCE) * (1 - 1e-9), 'left')
+        hi = np.searchsorted(rates, test_im_black_point_rate * (1 + BLACK_RATE_TOLERANCE) * (1 + 1e-9), 'right')
+        guest_idx, rows, rates = guest_idx[lo:hi], rows[lo:hi], rates[lo:hi]
+        rate_diff = np.abs(test_im_black_point_rate - rates) / test_im_black_point_rate
+        keep = ~(rate_diff > BLACK_RATE_TOLERANCE)
+        return guest_idx[keep], rows[keep]
+
+    @cached_property
+    def signatures(self) -> np.ndarray:
+        """全部字符的低分辨率签名，首次使用时计算"""
+        return downsample_signature(self.bits, self.shape)
+
+    def count_common_black(self, test_bits: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """求出测试图像与指定行标准图像的共同黑色像素数"""
+        return popcount(self.bits[rows] & test_bits)
+
+
+def match_rates(num_common_black: np.ndarray, num_std_black: np.ndarray,
+                num_test_black: int, num_test_white: int, size: int) -> np.ndarray:
+    """按 compare_im_np 的公式批量计算匹配率"""
+    # 共同白色 = 全部像素 - (标准黑色 ∪ 测试黑色)
+    num_common_white = size - (num_std_black + num_test_black - num_common_black)
+    if num_test_black != 0 and num_test_white != 0:
+        return (num_common_black / num_test_black + num_common_white / num_test_white) / 2
+    elif num_test_black == 0 and num_test_white != 0:
+        return num_common_white / num_test_white
+    elif num_test_black != 0 and num_test_white == 0:
+        return num_common_black / num_test_black
+    else:
+        return np.zeros(len(num_common_black), dtype=np.float64)
+
+
+def compare_bits_np(test_bits: np.ndarray, std_bits: np.ndarray, size: int) -> float:
+    """compare_im_np 的按位版本：输入两幅打包后的黑色像素图及原始像素数，输出匹配率"""
+    if test_bits.shape != std_bits.shape:
+        raise ImageMatchError("图像大小不一致")
+    num_test_black = int(popcount(test_bits))
+    num_common_black = popcount((test_bits & std_bits)[np.newaxis])
+    rate = match_rates(num_common_black, popcount(std_bits[np.newaxis]),
+                       num_test_black, size - num_test_black, size)
+    return float(rate[0])
+
+
+def _shortlist(test_bits: np.ndarray, shape: tuple[int, int], fonts: list[StackedFont],
+               candidates: list[tuple[np.ndarray, np.ndarray]], top_k: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    """以低分辨率签名的 L1 距离粗筛，在全部字体的候选中只保留距离最小的 top_k 个"""
+    test_signature = downsample_signature(test_bits, shape)[0]
+    distances = [np.abs(font.signatures[rows] - test_signature).sum(axis=1)
+                 for font, (_, rows) in zip(fonts, candidates)]
+    sizes = [len(d) for d in distances]
+    distances = np.concatenate(distances)
+    if len(distances) <= top_k:
+        return candidates
+    keep = np.zeros(len(distances), dtype=bool)
+    keep[np.argpartition(distances, top_k - 1)[:top_k]] = True
+    out = []
+    for (guest_idx, rows), font_keep in zip(candidates, np.split(keep, np.cumsum(sizes)[:-1])):
+        out.append((guest_idx[font_keep], rows[font_keep]))
+    return out
+
+
+def match_test_array(test_array: np.ndarray, fonts: list[StackedFont], guest_range: list[str],
+                     top_k: int | None = None) -> str:
+    """
+    将测试图像与全部标准字体的候选字符一次性比较，返回最匹配字符。
+    与逐字符循环语义一致：按 guest_range 顺序、再按字体顺序遍历，取首个最高匹配率。
+    top_k 不为 None 时，先以低分辨率签名粗筛出 top_k 个候选，再做全分辨率比较。
+    """
+    return match_test_array_with_rows(test_array, fonts, [font.guest_rows(guest_range) for font in fonts],
+                                      guest_range, top_k)
+
+
+class PackedTestArray:
+    """按位打包的测试图像及其黑白像素计数，剪枝与打分共用"""
+
+    def __init__(self, test_array: np.ndarray):
+        test_array = np.asarray(test_array, dtype=bool)
+        self.shape = test_array.shape
+        self.bits = pack_black_bits(test_array)
+        self.size = test_array.size
+        self.num_black = int(popcount(self.bits))
+        self.num_white = self.size - self.num_black
+        self.black_point_rate = self.num_black / self.size
+
+
+def prune_candidates(test: PackedTestArray, fonts: list[StackedFont],
+                     guest_rows: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+                     top_k: int | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+    """按黑色比例区间（及 top_k 签名粗筛）求出各字体的候选字符下标与行号"""
+    candidates = []
+    for font, rows in zip(fonts, guest_rows):
+        if font.shape != test.shape:
+            raise ImageMatchError("图像大小不一致")
+        candidates.append(font.rate_candidates(rows, test.black_point_rate))
+    if top_k is not None:
+        candidates = _shortlist(test.bits, test.shape, fonts, candidates, top_k)
+    return candidates
+
+
+def score_candidates(test: PackedTestArray, fonts: list[StackedFont],
+                     candidates: list[tuple[np.ndarray, np.ndarray]], guest_range: list[str]) -> str:
+    """全分辨率比较全部候选字符，返回最匹配字符；按 guest_range 顺序、再按字体顺序取首个最高匹配率"""
+    all_guest_idx = []
+    all_order = []
+    all_rates = []
+    for order, (font, (guest_idx, rows)) in enumerate(zip(fonts, candidates)):
+        if len(rows) == 0:
+            continue
+        num_common_black = font.count_common_black(test.bits, rows)
+        all_rates.append(match_rates(num_common_black, font.black_counts[rows],
+                                     test.num_black, test.num_white, test.size))
+        all_guest_idx.append(guest_idx)
+        all_order.append(np.full(len(rows), order, dtype=np.intp))
+
+    if not all_rates:
+        return ''
+    rates = np.concatenate(all_rates)
+    best_rate = rates.max()
+    if not best_rate > 0.0:
+        return ''
+    # 匹配率相同时，取遍历顺序中最靠前者
+    best = np.flatnonzero(rates == best_rate)
+    guest_idx = np.concatenate(all_guest_idx)[best]
+    order = np.concatenate(all_order)[best]
+    first = np.lexsort((order, guest_idx))[0]
+    return guest_range[guest_idx[first]]
+
+
+def match_test_array_with_rows(test_array: np.ndarray, fonts: list[StackedFont],
+                               guest_rows: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+                               guest_range: list[str], top_k: int | None = None) -> str:
+    """同 match_test_array，但使用预先由 StackedFont.guest_rows 求出的各字体候选行，省去逐次查表"""
+    test = PackedTestArray(test_array)
+    if test.black_point_rate == 0:
+        return ''
+    candidates = prune_candidates(test, fonts, guest_rows, top_k)
+    return score_candidates(test, fonts, candidates, guest_range)
+
+
+def measure_recall(test_arrays: list[np.ndarray], fonts: list[StackedFont], guest_range: list[str],
+                   top_k: int) -> float:
+    """粗筛 top_k 的召回率：粗筛后结果与穷举比较结果一致的测试图像所占比例"""
+    if not test_arrays:
+        return 1.0
+    hits = sum(
+        match_test_array(test_array, fonts, guest_range, top_k) == match_test_array(test_array, fonts, guest_range)
+        for test_array in test_arrays
+    )
+    return hits / len(test_arrays)
@@ -0,0 +1,130 @@
+import bisect
+import contextlib
+import threading
+import time
+from collections import Counter
+from typing import Callable, Iterator
+
+# 逐字符耗时直方图的桶上限（秒），与 Prometheus 默认桶相近并向下扩展到 0.1 ms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = 'font_tables'
+
+
+class Histogram:
+    """固定桶直方图；各桶保存落入该区间的个数，导出为 Prometheus 格式时再累加"""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float, n: int = 1):
+        self.counts[bisect.bisect_left(self.buckets, value)] += n
+        self.sum += value * n
+        self.count += n
+
+    def to_dict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": self.counts, "sum": self.sum, "count": self.count}
+
+
+class WorkflowMetrics:
+    """
+    统一流程的计时与计数：各阶段的墙钟时间、CPU 时间及调用次数，事件计数，以及逐字符耗时直方图。
+    可在多个线程中同时记录。
+    """
+
+    def __init__(self):
+        self.stages: dict[str, dict[str, float]] = {}
+        self.counters: Counter[str] = Counter()
+        self.histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, glyphs: int = 0,
+              cpu_clock: Callable[[], float] = time.process_time) -> Iterator[None]:
+        """
+        记录一个阶段的墙钟时间与 CPU 时间，同名阶段累加。
+        glyphs 不为 0 时，将墙钟时间均摊到这些字符上，计入该阶段的逐字符耗时直方图。
+        默认 CPU 时间为整个进程的（含 OCR 推理库自身的线程）；
+        在线程池中并行执行的阶段应传入 time.thread_time，只计本线程。
+        """
+        wall_start = time.perf_counter()
+        cpu_start = cpu_clock()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            self.add_stage(name, wall, cpu_clock() - cpu_start)
+            if glyphs:
+                self.observe(name, wall / glyphs, glyphs)
+
+    def add_stage(self, name: str, wall: float, cpu: float = 0.0):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            stage["wall_seconds"] += wall
+            stage["cpu_seconds"] += cpu
+            stage["calls"] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def observe(self, name: str, seconds: float, n: int = 1):
+        """记录 n 个字符各耗时 seconds，用于逐字符耗时直方图"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds, n)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+
+def timed(metrics: WorkflowMetrics | None, name: str, glyphs: int = 0,
+          cpu_clock: Callable[[], float] = time.process_time) -> contextlib.AbstractContextManager:
+    """metrics 为 None 时不计时，否则同 WorkflowMetrics.stage"""
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.stage(name, glyphs, cpu_clock)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metrics_to_prometheus(metrics_by_font: dict[str, dict]) -> str:
+    """将各字体 WorkflowMetrics.to_dict() 的结果转为 Prometheus 文本格式，以 font 标签区分"""
+    lines = [
+        f"# TYPE {METRIC_PREFIX}_stage_wall_seconds counter",
+        f"# TYPE {METRIC_PREFIX}_stage_cpu_seconds counter",
+        f"# TYPE {METRIC_PREFIX}_stage_calls_total counter",
+        f"# TYPE {METRIC_PREFIX}_events_total counter",
+        f"# TYPE {METRIC_PREFIX}_glyph_latency_seconds histogram",
+    ]
+    for font, metrics in sorted(metrics_by_font.items()):
+        font = _escape_label(font)
+        for stage, values in sorted(metrics["stages"].items()):
+            labels = f'font="{font}",stage="{_escape_label(stage)}"'
+            lines.append(f"{METRIC_PREFIX}_stage_wall_seconds{{{labels}}} {values['wall_seconds']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_stage_cpu_seconds{{{labels}}} {values['cpu_seconds']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_stage_calls_total{{{labels}}} {values['calls']}")
+        for event, n in sorted(metrics["counters"].items()):
+            lines.append(f'{METRIC_PREFIX}_events_total{{font="{font}",event="{_escape_label(event)}"}} {n}')
+        for stage, histogram in sorted(metrics["histograms"].items()):
+            labels = f'font="{font}",stage="{_escape_label(stage)}"'
+            cumulative = 0
+            for bound, n in zip([*histogram["buckets"], "+Inf"], histogram["counts"]):
+                cumulative += n
+                lines.append(f'{METRIC_PREFIX}_glyph_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{METRIC_PREFIX}_glyph_latency_seconds_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_glyph_latency_seconds_count{{{labels}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
@@ -1,20 +1,52 @@
-import io
+import logging
 import os
-from fontTools.ttLib import ttFont
-from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+from PIL import Image, ImageDraw
+from functools import lru_cache
 from paddlex import create_pipeline
-from lib import woff2_to_ttf, get_charater_hex
-from slow import draw, IMAGE_SIZE, FONT_SIZE, match_test_im_with_cache, init_true_font, load_std_guest_range
+from glyph_cache import GlyphCache, SOURCE_IMAGE, SOURCE_OCR, SOURCE_QUICK
+from lib import LoadedFont, get_charater_hex
+from logging_config import GlyphSummary, get_glyph_logger
+from metrics import WorkflowMetrics, timed
+from slow import draw, IMAGE_SIZE, FONT_SIZE, match_test_im_with_cache, init_true_font, load_std_guest_range, StandardFontBank
 
-# Initialize PaddleX OCR pipeline
-ocr = create_pipeline(pipeline="OCR")
+logger = logging.getLogger(__name__)
+# Per-glyph messages; silent unless enabled with configure_logging(glyph_details=True)
+glyph_logger = get_glyph_logger(__name__)
 
-def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_range=None, TRUE_FONT_PATH=None, limit_chars: int | None = None) -> dict[str, str]:
+# Bump whenever a change alters the output of extract_characters_unified_workflow,
+# so results cached under the old version are no longer used
+UNIFIED_WORKFLOW_VERSION = "unified-1"
+
+
+@lru_cache
+def get_ocr_pipeline():
+    """
+    Create the PaddleX OCR pipeline on first use.
+    Not built at import time, so a parent process that only dispatches work
+    never loads the Paddle runtime before starting its workers.
+    """
+    return create_pipeline(pipeline="OCR")
+
+
+def _get_rec_model():
+    """
+    The OCR pipeline's own text recognition model, for recognition-only inference.
+    Reusing it keeps one copy of the model per process and always matches the pipeline config.
+    """
+    pipeline = get_ocr_pipeline()
+    # The public OCR pipeline wraps the pipeline that owns the sub-models
+    model = getattr(getattr(pipeline, '_pipeline', pipeline), 'text_rec_model', None)
+    if model is None:
+        raise RuntimeError("OCR pipeline exposes no text recognition model; use recognition_only=False")
+    return model
+
+def extract_characters_with_paddleocr(font_path: str | bytes | LoadedFont, std_font_dict=None, guest_range=None, TRUE_FONT_PATH=None, limit_chars: int | None = None) -> dict[str, str]:
     """
     Extracts characters from a font file and maps them to recognized characters using OCR with fallback to image similarity.
 
     Args:
-        font_path: Path to the font file (WOFF2, TTF, or OTF).
+        font_path: Font file path, raw bytes or a LoadedFont (WOFF, WOFF2, TTF, or OTF).
         std_font_dict: Dictionary of standard fonts for fallback (optional).
         guest_range: List of characters to match against for fallback (optional).
         TRUE_FONT_PATH: Path to true font files for fallback (optional).
@@ -26,39 +58,11 @@ def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_
             font_char: 'recognized_char'
         }
     """
-    if font_path.lower().endswith('.woff2'):
-        with open(font_path, 'rb') as f:
-            font_bytes = f.read()
-        ttf_font = woff2_to_ttf(font_bytes)
-        # Save TTF to a temporary file as Pillow needs a file path or a file-like object
-        # that supports seek, which BytesIO from woff2_to_ttf doesn't fully provide for ImageFont
-        temp_ttf_file = io.BytesIO()
-        ttf_font.save(temp_ttf_file)
-        temp_ttf_file.seek(0)
-        pil_font = ImageFont.truetype(temp_ttf_file, FONT_SIZE)
-        # Get characters from the TTFont object
-        characters = set()
-        for table in ttf_font['cmap'].tables:
-            for char_code in table.cmap:
-                character = chr(char_code)
-                characters.add(character)
-        # Convert set to list to maintain an order, though order isn't strictly necessary here
-        characters = list(characters)
-        print(f"First 10 characters from font (WOFF2): {characters[:10]}")
-
-
-    elif font_path.lower().endswith('.ttf') or font_path.lower().endswith('.otf'):
-        pil_font = ImageFont.truetype(font_path, FONT_SIZE)
-        # For TTF/OTF, we can also use fontTools to list characters to be consistent
-        ft_font = ttFont.TTFont(font_path)
-        characters = set()
-        for table in ft_font['cmap'].tables:
-            for char_code in table.cmap:
-                character = chr(char_code)
-                characters.add(character)
-        characters = list(characters)
-    else:
-        raise ValueError("Unsupported font format. Please provide a WOFF2, TTF, or OTF file.")
+    # Format is sniffed from magic bytes; cmap and the Pillow font come from one parse
+    font = font_path if isinstance(font_path, LoadedFont) else LoadedFont(font_path)
+    pil_font = font.pil_font(FONT_SIZE)
+    characters = font.characters
+    logger.info("First 10 characters from font (%s): %s", font.format.upper(), characters[:10])
 
     # Process ALL characters from the font (not just PUA characters)
     characters_to_process = characters
@@ -66,9 +70,9 @@ def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_
     # Apply character limit if specified (for testing)
     if limit_chars is not None and limit_chars > 0:
         characters_to_process = characters_to_process[:limit_chars]
-        print(f"Limited processing to first {limit_chars} characters")
+        logger.info("Limited processing to first %d characters", limit_chars)
     
-    print(f"Found {len(characters_to_process)} characters to process (processing all font characters)")
+    logger.info("Found %d characters to process (processing all font characters)", len(characters_to_process))
     
     char_to_char_map = {}
     # Create debug_images directory if it doesn't exist (relative to CWD)
@@ -87,46 +91,13 @@ def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_
             # Render character to image with OCR-optimized settings
             char_image_original = draw(char_to_render, pil_font, IMAGE_SIZE)
 
-            # Convert 1-bit image to RGB for better OCR compatibility
-            if char_image_original.mode == '1':
-                # Convert 1-bit to RGB with proper scaling
-                char_image_rgb = Image.new('RGB', char_image_original.size, 'white')
-                # Create a high-contrast RGB version
-                pixels = char_image_original.load()
-                rgb_pixels = char_image_rgb.load()
-                for y in range(char_image_original.height):
-                    for x in range(char_image_original.width):
-                        if pixels[x, y] == 0:  # Black pixel in 1-bit mode
-                            rgb_pixels[x, y] = (0, 0, 0)  # Black
-                        else:
-                            rgb_pixels[x, y] = (255, 255, 255)  # White
-                char_image_original = char_image_rgb
-
-            # Check if the image is mostly white (blank glyph detection)
-            test_image_l = char_image_original.convert('L')
-            extrema = test_image_l.getextrema()
-            
-            # More robust blank detection for RGB images
-            if extrema[0] == extrema[1] and extrema[0] >= 250:
-                print(f"Skipping OCR for char '{char_to_render}' (ord: {ord(char_to_render)}) as rendered image appears blank/mostly white.")
+            # Convert to the padded RGB array PaddleX expects, skipping blank glyphs
+            img_np = glyph_to_ocr_array(char_image_original)
+            if img_np is None:
+                glyph_logger.debug("Skipping OCR for char %r (ord: %d) as rendered image appears blank/mostly white.",
+                                   char_to_render, ord(char_to_render))
                 continue
 
-            # Enhanced padding for OCR - larger padding for better recognition
-            padding = 20  # Increased padding for better OCR context
-            new_size = (char_image_original.width + 2 * padding, char_image_original.height + 2 * padding)
-            char_image_padded = Image.new('RGB', new_size, (255, 255, 255))  # White background
-            
-            # Center the character in the padded area
-            paste_x = (new_size[0] - char_image_original.width) // 2
-            paste_y = (new_size[1] - char_image_original.height) // 2
-            char_image_padded.paste(char_image_original, (paste_x, paste_y))
-            
-            # Use RGB image directly (no BGR conversion needed for PaddleX)
-            char_image_rgb = char_image_padded
-
-            # Convert PIL image to numpy array
-            import numpy as np
-
             # Save image for debugging if count is less than max
             if saved_image_count < max_debug_images:
                 try:
@@ -135,18 +106,17 @@ def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_
                     if not safe_char_name: # handle cases where char might be purely symbolic
                         safe_char_name = f"char_ord_{ord(char_to_render)}"
 
-                    print(f"Attempting to save debug image for char: '{char_to_render}' (ord: {ord(char_to_render)}) as ocr_input_{saved_image_count}_{safe_char_name}.png")
+                    logger.debug("Attempting to save debug image for char: %r (ord: %d) as ocr_input_%d_%s.png",
+                                 char_to_render, ord(char_to_render), saved_image_count, safe_char_name)
                     debug_image_path = os.path.join(debug_image_dir, f"ocr_input_{saved_image_count}_{safe_char_name}.png")
-                    char_image_rgb.save(debug_image_path) # Save the RGB PIL image
+                    Image.fromarray(img_np).save(debug_image_path) # Save the RGB OCR input
                     # print(f"Saved debug image to {debug_image_path}") # Optional: print path
                     saved_image_count += 1
                 except Exception as img_save_e:
-                    print(f"Could not save debug image for char '{char_to_render}': {img_save_e}")
-
-            img_np = np.array(char_image_rgb)
+                    logger.warning("Could not save debug image for char %r: %s", char_to_render, img_save_e)
 
             # Perform OCR using PaddleX with optimized parameters for single character recognition
-            ocr_results = ocr.predict(
+            ocr_results = get_ocr_pipeline().predict(
                 input=img_np,
                 use_doc_orientation_classify=False,  # Disable document orientation for single chars
                 use_doc_unwarping=False,            # Disable document unwarping for single chars
@@ -156,20 +126,20 @@ def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_
             # Convert generator to list
             ocr_results_list = list(ocr_results)
             
-            # Debug: print actual result structure to understand the API response
-            print(f"DEBUG: OCR results list length: {len(ocr_results_list)}")
+            # Debug: log actual result structure to understand the API response
+            glyph_logger.debug("OCR results list length: %d", len(ocr_results_list))
             
             if ocr_results_list:
                 ocr_result = ocr_results_list[0]  # Get the first (and likely only) result
-                print(f"DEBUG: OCR result type: {type(ocr_result)}")
+                glyph_logger.debug("OCR result type: %s", type(ocr_result))
                 
                 # Access recognized texts from PaddleX OCRResult (dict-style access)
                 if 'rec_texts' in ocr_result and ocr_result['rec_texts']:
                     recognized_texts = ocr_result['rec_texts']
                     confidence_scores = ocr_result.get('rec_scores', [])
-                    print(f"DEBUG: Found {len(recognized_texts)} recognized texts: {recognized_texts}")
+                    glyph_logger.debug("Found %d recognized texts: %s", len(recognized_texts), recognized_texts)
                     if confidence_scores:
-                        print(f"DEBUG: Confidence scores: {confidence_scores}")
+                        glyph_logger.debug("Confidence scores: %s", confidence_scores)
                     
                     # If we have recognized text
                     if recognized_texts and len(recognized_texts) > 0:
@@ -184,54 +154,190 @@ def extract_characters_with_paddleocr(font_path: str, std_font_dict=None, guest_
                             if confidence >= 0.95:
                                 # Accept any recognized character (no restriction to Chinese characters)
                                 char_to_char_map[char_to_render] = recognized_char
-                                print(f"Successfully mapped '{char_to_render}' (U+{ord(char_to_render):04X}) -> '{recognized_char}' [confidence: {confidence:.3f}]")
+                                glyph_logger.debug("Successfully mapped %r (U+%04X) -> %r [confidence: %.3f]",
+                                                   char_to_render, ord(char_to_render), recognized_char, confidence)
                             else:
-                                print(f"Low confidence recognition for '{char_to_render}': '{recognized_char}' [confidence: {confidence:.3f}] - using fallback")
+                                glyph_logger.debug("Low confidence recognition for %r: %r [confidence: %.3f] - using fallback",
+                                                   char_to_render, recognized_char, confidence)
                                 # Use fallback for low confidence results
                                 if std_font_dict and guest_range and TRUE_FONT_PATH:
-                                    fallback_result = match_test_im_with_cache(char_image_rgb, std_font_dict, guest_range, TRUE_FONT_PATH)
+                                    fallback_result = match_test_im_with_cache(char_image_original, std_font_dict, guest_range, TRUE_FONT_PATH)
                                     if fallback_result:
                                         char_to_char_map[char_to_render] = fallback_result
-                                        print(f"Fallback matched '{char_to_render}' -> '{fallback_result}'")
+                                        glyph_logger.debug("Fallback matched %r -> %r", char_to_render, fallback_result)
                         else:
-                            print(f"DEBUG: Unhandled recognized text: '{recognized_text}' (length: {len(recognized_text) if recognized_text else 0}) [confidence: {confidence:.3f}]")
+                            glyph_logger.debug("Unhandled recognized text: %r (length: %d) [confidence: %.3f]",
+                                               recognized_text, len(recognized_text) if recognized_text else 0, confidence)
                             # Try fallback for unhandled text
                             if std_font_dict and guest_range and TRUE_FONT_PATH:
-                                fallback_result = match_test_im_with_cache(char_image_rgb, std_font_dict, guest_range, TRUE_FONT_PATH)
+                                fallback_result = match_test_im_with_cache(char_image_original, std_font_dict, guest_range, TRUE_FONT_PATH)
                                 if fallback_result:
                                     char_to_char_map[char_to_render] = fallback_result
-                                    print(f"Fallback matched '{char_to_render}' -> '{fallback_result}'")
+                                    glyph_logger.debug("Fallback matched %r -> %r", char_to_render, fallback_result)
                 else:
-                    print(f"DEBUG: No rec_texts found in result or rec_texts is empty")
+                    glyph_logger.debug("No rec_texts found in result or rec_texts is empty")
                     # Try fallback when no OCR results
                     if std_font_dict and guest_range and TRUE_FONT_PATH:
-                        fallback_result = match_test_im_with_cache(char_image_rgb, std_font_dict, guest_range, TRUE_FONT_PATH)
+                        fallback_result = match_test_im_with_cache(char_image_original, std_font_dict, guest_range, TRUE_FONT_PATH)
                         if fallback_result:
                             char_to_char_map[char_to_render] = fallback_result
-                            print(f"Fallback matched '{char_to_render}' -> '{fallback_result}'")
+                            glyph_logger.debug("Fallback matched %r -> %r", char_to_render, fallback_result)
             else:
-                print(f"DEBUG: No OCR results returned")
+                glyph_logger.debug("No OCR results returned")
                 # Try fallback when no OCR results at all
                 if std_font_dict and guest_range and TRUE_FONT_PATH:
-                    fallback_result = match_test_im_with_cache(char_image_rgb, std_font_dict, guest_range, TRUE_FONT_PATH)
+                    fallback_result = match_test_im_with_cache(char_image_original, std_font_dict, guest_range, TRUE_FONT_PATH)
                     if fallback_result:
                         char_to_char_map[char_to_render] = fallback_result
-                        print(f"Fallback matched '{char_to_render}' -> '{fallback_result}'")
+                        glyph_logger.debug("Fallback matched %r -> %r", char_to_render, fallback_result)
 
         except Exception as e:
             # Try fallback when OCR fails completely
             if std_font_dict and guest_range and TRUE_FONT_PATH:
                 try:
-                    fallback_result = match_test_im_with_cache(char_image_rgb, std_font_dict, guest_range, TRUE_FONT_PATH)
+                    fallback_result = match_test_im_with_cache(char_image_original, std_font_dict, guest_range, TRUE_FONT_PATH)
                     if fallback_result:
                         char_to_char_map[char_to_render] = fallback_result
-                        print(f"Fallback matched '{char_to_render}' -> '{fallback_result}' (OCR failed)")
+                        glyph_logger.debug("Fallback matched %r -> %r (OCR failed)", char_to_render, fallback_result)
                 except Exception:
                     pass # Continue with other characters
 
     return char_to_char_map
 
-def extract_single_character_ocr(char_to_render: str, pil_font, confidence_threshold: float = 0.95) -> tuple[str | None, float]:
+# White margin added around each glyph for better OCR context
+OCR_PADDING = 20
+
+
+def glyph_to_ocr_array(char_image: Image.Image, padding: int = OCR_PADDING) -> np.ndarray | None:
+    """
+    Turn a rendered glyph into the padded RGB uint8 array PaddleX expects, without per-pixel Python.
+
+    Returns:
+        An (H + 2 * padding, W + 2 * padding, 3) array, or None when the glyph is blank.
+    """
+    if char_image.mode == '1':
+        # 1-bit pixels are True for white: map straight to 0 / 255
+        gray = np.asarray(char_image).astype(np.uint8) * np.uint8(255)
+        rgb = np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+    else:
+        rgb = np.asarray(char_image.convert('RGB'))
+        gray = np.asarray(char_image.convert('L'))
+
+    # Check if the image is mostly white (blank glyph detection)
+    lo, hi = int(gray.min()), int(gray.max())
+    if lo == hi and lo >= 250:
+        return None
+
+    # Center the character in a white padded area
+    return np.pad(rgb, ((padding, padding), (padding, padding), (0, 0)), constant_values=255)
+
+
+def _render_ocr_input(char_to_render: str, pil_font, summary: GlyphSummary | None = None,
+                      metrics: WorkflowMetrics | None = None):
+    """
+    Render a character into the padded RGB array fed to PaddleX.
+
+    Returns:
+        The RGB numpy array, or None when the character is whitespace or renders blank.
+    """
+    if not char_to_render.strip():  # Skip whitespace or control characters
+        if summary is not None:
+            summary.record("whitespace")
+        return None
+
+    # Render character to image with OCR-optimized settings
+    with timed(metrics, "render", 1):
+        char_image_original = draw(char_to_render, pil_font, IMAGE_SIZE)
+
+    with timed(metrics, "ocr_preprocess", 1):
+        img_np = glyph_to_ocr_array(char_image_original)
+    if img_np is None:
+        glyph_logger.debug("Skipping OCR for char %r (ord: %d) as rendered image appears blank/mostly white.",
+                           char_to_render, ord(char_to_render))
+        if summary is not None:
+            summary.record("blank")
+    return img_np
+
+
+def _predict_ocr(images):
+    """Run the PaddleX OCR pipeline on one image or a list of images, returning a list of results."""
+    return list(get_ocr_pipeline().predict(
+        input=images,
+        use_doc_orientation_classify=False,
+        use_doc_unwarping=False,
+        use_textline_orientation=False,
+    ))
+
+
+def _predict_rec(images, batch_size: int = 1):
+    """
+    Run only the text recognition model on one image or a list of images.
+    Glyph images are already cropped and centred, so text detection is skipped.
+    """
+    return list(_get_rec_model().predict(input=images, batch_size=batch_size))
+
+
+def _accept_recognized_text(char_to_render: str, recognized_text: str, confidence: float,
+                            confidence_threshold: float,
+                            summary: GlyphSummary | None = None) -> tuple[str | None, float]:
+    """Accept a recognized text only if it is a single character above the confidence threshold."""
+    # Check if single character recognized and meets confidence threshold
+    if recognized_text and len(recognized_text.strip()) == 1:
+        recognized_char = recognized_text.strip()
+
+        if confidence >= confidence_threshold:
+            glyph_logger.debug("OCR SUCCESS: %r (U+%04X) -> %r [confidence: %.3f]",
+                               char_to_render, ord(char_to_render), recognized_char, confidence)
+            event = "ocr_success"
+        else:
+            glyph_logger.debug("OCR LOW CONFIDENCE: %r: %r [confidence: %.3f]",
+                               char_to_render, recognized_char, confidence)
+            recognized_char = None
+            event = "ocr_low_confidence"
+    else:
+        glyph_logger.debug("OCR INVALID: %r got %r (length: %d)",
+                           char_to_render, recognized_text, len(recognized_text) if recognized_text else 0)
+        recognized_char = None
+        event = "ocr_invalid"
+    if summary is not None:
+        summary.record(event)
+    return recognized_char, confidence
+
+
+def _ocr_failed(char_to_render: str, reason: str, summary: GlyphSummary | None) -> tuple[None, float]:
+    glyph_logger.debug("OCR FAILED: %r - %s", char_to_render, reason)
+    if summary is not None:
+        summary.record("ocr_failed")
+    return None, 0.0
+
+
+def _parse_ocr_result(char_to_render: str, ocr_result, confidence_threshold: float,
+                      summary: GlyphSummary | None = None) -> tuple[str | None, float]:
+    """Interpret one PaddleX OCR result for a single-glyph image."""
+    if ocr_result is not None and 'rec_texts' in ocr_result and ocr_result['rec_texts']:
+        recognized_texts = ocr_result['rec_texts']
+        confidence_scores = ocr_result.get('rec_scores', [])
+        recognized_text = recognized_texts[0]
+        confidence = float(confidence_scores[0]) if len(confidence_scores) else 0.0
+        return _accept_recognized_text(char_to_render, recognized_text, confidence, confidence_threshold, summary)
+
+    return _ocr_failed(char_to_render, "no valid recognition", summary)
+
+
+def _parse_rec_result(char_to_render: str, rec_result, confidence_threshold: float,
+                      summary: GlyphSummary | None = None) -> tuple[str | None, float]:
+    """Interpret one text recognition model result for a single-glyph image."""
+    if rec_result is not None and 'rec_text' in rec_result:
+        return _accept_recognized_text(char_to_render, rec_result['rec_text'],
+                                       float(rec_result.get('rec_score', 0.0)), confidence_threshold, summary)
+
+    return _ocr_failed(char_to_render, "no valid recognition", summary)
+
+
+def extract_single_character_ocr(char_to_render: str, pil_font, confidence_threshold: float = 0.95,
+                                 recognition_only: bool = True,
+                                 summary: GlyphSummary | None = None,
+                                 metrics: WorkflowMetrics | None = None) -> tuple[str | None, float]:
     """
     Process a single character with OCR and return result with confidence.
     
@@ -239,105 +345,197 @@ def extract_single_character_ocr(char_to_render: str, pil_font, confidence_thres
         char_to_render: Character to process
         pil_font: PIL font object for rendering
         confidence_threshold: Minimum confidence required for acceptance
-        
+        recognition_only: Run only the text recognition model; False uses the full OCR pipeline
+        summary: Per-font outcome counters (optional)
+        metrics: Stage timings and per-glyph latencies (optional)
+
     Returns:
         Tuple of (recognized_character, confidence) or (None, 0.0) for failures
     """
-    if not char_to_render.strip():  # Skip whitespace or control characters
-        return None, 0.0
-
     try:
-        # Render character to image with OCR-optimized settings
-        char_image_original = draw(char_to_render, pil_font, IMAGE_SIZE)
-
-        # Convert 1-bit image to RGB for better OCR compatibility
-        if char_image_original.mode == '1':
-            char_image_rgb = Image.new('RGB', char_image_original.size, 'white')
-            pixels = char_image_original.load()
-            rgb_pixels = char_image_rgb.load()
-            for y in range(char_image_original.height):
-                for x in range(char_image_original.width):
-                    if pixels[x, y] == 0:  # Black pixel in 1-bit mode
-                        rgb_pixels[x, y] = (0, 0, 0)  # Black
-                    else:
-                        rgb_pixels[x, y] = (255, 255, 255)  # White
-            char_image_original = char_image_rgb
-
-        # Check if the image is mostly white (blank glyph detection)
-        test_image_l = char_image_original.convert('L')
-        extrema = test_image_l.getextrema()
-        
-        if extrema[0] == extrema[1] and extrema[0] >= 250:
-            print(f"Skipping OCR for char '{char_to_render}' (ord: {ord(char_to_render)}) as rendered image appears blank/mostly white.")
+        img_np = _render_ocr_input(char_to_render, pil_font, summary, metrics)
+        if img_np is None:
             return None, 0.0
 
-        # Enhanced padding for OCR
-        padding = 20
-        new_size = (char_image_original.width + 2 * padding, char_image_original.height + 2 * padding)
-        char_image_padded = Image.new('RGB', new_size, (255, 255, 255))
-        
-        paste_x = (new_size[0] - char_image_original.width) // 2
-        paste_y = (new_size[1] - char_image_original.height) // 2
-        char_image_padded.paste(char_image_original, (paste_x, paste_y))
-        
-        char_image_rgb = char_image_padded
-
-        # Convert PIL image to numpy array
-        import numpy as np
-        img_np = np.array(char_image_rgb)
-
-        # Perform OCR using PaddleX
-        ocr_results = ocr.predict(
-            input=img_np,
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_textline_orientation=False,
-        )
-        
-        ocr_results_list = list(ocr_results)
-        
-        if ocr_results_list:
-            ocr_result = ocr_results_list[0]
-            
-            if 'rec_texts' in ocr_result and ocr_result['rec_texts']:
-                recognized_texts = ocr_result['rec_texts']
-                confidence_scores = ocr_result.get('rec_scores', [])
-                
-                if recognized_texts and len(recognized_texts) > 0:
-                    recognized_text = recognized_texts[0]
-                    confidence = confidence_scores[0] if confidence_scores else 0.0
-                    
-                    # Check if single character recognized and meets confidence threshold
-                    if recognized_text and len(recognized_text.strip()) == 1:
-                        recognized_char = recognized_text.strip()
-                        
-                        if confidence >= confidence_threshold:
-                            print(f"OCR SUCCESS: '{char_to_render}' (U+{ord(char_to_render):04X}) -> '{recognized_char}' [confidence: {confidence:.3f}]")
-                            return recognized_char, confidence
-                        else:
-                            print(f"OCR LOW CONFIDENCE: '{char_to_render}': '{recognized_char}' [confidence: {confidence:.3f}]")
-                            return None, confidence
-                    else:
-                        print(f"OCR INVALID: '{char_to_render}' got '{recognized_text}' (length: {len(recognized_text) if recognized_text else 0})")
-                        return None, confidence if 'confidence' in locals() else 0.0
+        with timed(metrics, "ocr_inference", 1):
+            if recognition_only:
+                rec_results_list = _predict_rec(img_np)
+                rec_result = rec_results_list[0] if rec_results_list else None
+                return _parse_rec_result(char_to_render, rec_result, confidence_threshold, summary)
 
-        print(f"OCR FAILED: '{char_to_render}' - no valid recognition")
-        return None, 0.0
+            ocr_results_list = _predict_ocr(img_np)
+            ocr_result = ocr_results_list[0] if ocr_results_list else None
+            return _parse_ocr_result(char_to_render, ocr_result, confidence_threshold, summary)
 
     except Exception as e:
-        print(f"OCR EXCEPTION: '{char_to_render}' - {str(e)}")
+        glyph_logger.debug("OCR EXCEPTION: %r - %s", char_to_render, e)
+        if summary is not None:
+            summary.record("ocr_exception")
         return None, 0.0
 
-def extract_characters_unified_workflow(font_path: str, std_font_dict=None, guest_range=None, TRUE_FONT_PATH=None, limit_chars: int | None = None) -> dict[str, str]:
+
+def _tile_ocr_inputs(images: list[np.ndarray], columns: int) -> tuple[np.ndarray, tuple[int, int]]:
+    """Lay out equally sized glyph images on a white grid, returning the tile and the cell size."""
+    cell_h = max(im.shape[0] for im in images)
+    cell_w = max(im.shape[1] for im in images)
+    rows = -(-len(images) // columns)
+    tile = np.full((rows * cell_h, columns * cell_w, 3), 255, dtype=np.uint8)
+    for i, im in enumerate(images):
+        y, x = (i // columns) * cell_h, (i % columns) * cell_w
+        tile[y:y + im.shape[0], x:x + im.shape[1]] = im
+    return tile, (cell_h, cell_w)
+
+
+def _parse_tiled_ocr_result(chars: list[str], ocr_result, cell_size: tuple[int, int], columns: int,
+                            confidence_threshold: float,
+                            summary: GlyphSummary | None = None) -> dict[str, tuple[str | None, float]]:
+    """Map detections of a tiled image back to the glyph whose cell contains each box centre."""
+    cell_h, cell_w = cell_size
+    hits: dict[int, list[tuple[str, float]]] = {}
+    if ocr_result is not None and 'rec_texts' in ocr_result:
+        for text, score, poly in zip(ocr_result['rec_texts'],
+                                     ocr_result.get('rec_scores', []),
+                                     ocr_result.get('rec_polys', [])):
+            cx, cy = np.asarray(poly, dtype=np.float64).mean(axis=0)
+            cell = int(cy // cell_h) * columns + int(cx // cell_w)
+            hits.setdefault(cell, []).append((text, float(score)))
+
+    results = {}
+    for i, char_to_render in enumerate(chars):
+        cell_hits = hits.get(i, [])
+        if len(cell_hits) == 1:
+            results[char_to_render] = _accept_recognized_text(
+                char_to_render, cell_hits[0][0], cell_hits[0][1], confidence_threshold, summary)
+        else:
+            # Zero or several detections in one cell cannot be attributed reliably
+            results[char_to_render] = _ocr_failed(
+                char_to_render, f"{len(cell_hits)} detections in tile cell", summary)
+    return results
+
+
+def _iter_ocr_batches(characters: list[str], pil_font, batch_size: int,
+                      results: dict[str, tuple[str | None, float]],
+                      summary: GlyphSummary | None = None, metrics: WorkflowMetrics | None = None):
+    """
+    Render characters lazily and yield them in batches of up to batch_size OCR inputs,
+    so only one batch of padded images is held in memory at a time.
+    Characters that cannot be rendered are recorded in results as (None, 0.0) and not yielded.
+
+    Yields:
+        (batch_chars, batch_images) tuples
+    """
+    batch_chars = []
+    batch_images = []
+    for char_to_render in characters:
+        try:
+            img_np = _render_ocr_input(char_to_render, pil_font, summary, metrics)
+        except Exception as e:
+            glyph_logger.debug("OCR EXCEPTION: %r - %s", char_to_render, e)
+            if summary is not None:
+                summary.record("ocr_exception")
+            img_np = None
+        if img_np is None:
+            results[char_to_render] = (None, 0.0)
+            continue
+        batch_chars.append(char_to_render)
+        batch_images.append(img_np)
+        if len(batch_chars) == batch_size:
+            yield batch_chars, batch_images
+            batch_chars = []
+            batch_images = []
+    if batch_chars:
+        yield batch_chars, batch_images
+
+
+def extract_characters_ocr_batch(characters: list[str], pil_font, confidence_threshold: float = 0.95,
+                                 batch_size: int = 16, tile_columns: int | None = None,
+                                 recognition_only: bool = True,
+                                 summary: GlyphSummary | None = None,
+                                 metrics: WorkflowMetrics | None = None) -> dict[str, tuple[str | None, float]]:
+    """
+    Render characters batch by batch and run OCR on each batch as soon as it is rendered.
+
+    Args:
+        characters: Characters to process
+        pil_font: PIL font object for rendering
+        confidence_threshold: Minimum confidence required for acceptance
+        batch_size: Number of glyph images passed to each PaddleX predict call
+        tile_columns: If set, glyphs of a batch are tiled into one image with this many columns
+            and detections are mapped back to their cells, instead of one image per glyph.
+            The text detector may merge horizontally adjacent glyphs into one line, so narrow
+            grids (a single column is safest) give the most reliable mapping.
+            Tiling needs text detection, so it always uses the full OCR pipeline.
+        recognition_only: Run only the text recognition model; False uses the full OCR pipeline
+        summary: Per-font outcome counters (optional)
+        metrics: Stage timings and per-glyph latencies (optional); OCR inference time of a batch
+            is spread evenly over its glyphs
+
+    Returns:
+        A dictionary mapping every input character to (recognized_character, confidence),
+        with (None, confidence) for failures, as extract_single_character_ocr does.
+    """
+    results: dict[str, tuple[str | None, float]] = {}
+    batch_size = max(1, batch_size)
+    for batch_chars, batch_images in _iter_ocr_batches(characters, pil_font, batch_size, results, summary, metrics):
+        with timed(metrics, "ocr_inference", len(batch_chars)):
+            try:
+                if tile_columns:
+                    tile, cell_size = _tile_ocr_inputs(batch_images, tile_columns)
+                    ocr_results_list = _predict_ocr(tile)
+                    results.update(_parse_tiled_ocr_result(
+                        batch_chars, ocr_results_list[0] if ocr_results_list else None,
+                        cell_size, tile_columns, confidence_threshold, summary))
+                elif recognition_only:
+                    rec_results_list = _predict_rec(batch_images, batch_size=batch_size)
+                    for i, char_to_render in enumerate(batch_chars):
+                        rec_result = rec_results_list[i] if i < len(rec_results_list) else None
+                        results[char_to_render] = _parse_rec_result(char_to_render, rec_result, confidence_threshold,
+                                                                    summary)
+                else:
+                    ocr_results_list = _predict_ocr(batch_images)
+                    for i, char_to_render in enumerate(batch_chars):
+                        ocr_result = ocr_results_list[i] if i < len(ocr_results_list) else None
+                        results[char_to_render] = _parse_ocr_result(char_to_render, ocr_result, confidence_threshold,
+                                                                    summary)
+            except Exception as e:
+                logger.warning("OCR EXCEPTION: batch of %d characters - %s", len(batch_chars), e)
+                if summary is not None:
+                    summary.record("ocr_exception", len(batch_chars))
+                for char_to_render in batch_chars:
+                    results[char_to_render] = (None, 0.0)
+
+    return results
+
+def extract_characters_unified_workflow(font_path: str | bytes | LoadedFont, std_font_dict=None, guest_range=None, TRUE_FONT_PATH=None, limit_chars: int | None = None,
+                                        batch_size: int = 16, tile_columns: int | None = None,
+                                        recognition_only: bool = True, fallback_workers: int = 1,
+                                        std_font_bank: StandardFontBank | None = None,
+                                        glyph_cache: GlyphCache | None = None,
+                                        summary_interval: float = 10.0,
+                                        metrics: WorkflowMetrics | None = None) -> dict[str, str]:
     """
     Unified workflow: Use PaddleOCR first, then fallback to image similarity for failed characters only.
     
     Args:
-        font_path: Path to the font file (WOFF2, TTF, or OTF).
+        font_path: Font file path, raw bytes or a LoadedFont (WOFF, WOFF2, TTF, or OTF).
         std_font_dict: Dictionary of standard fonts for fallback (optional).
         guest_range: List of characters to match against for fallback (optional).
         TRUE_FONT_PATH: Path to true font files for fallback (optional).
         limit_chars: Limit processing to first N characters (for testing purposes).
+        batch_size: Number of glyphs per OCR call; 1 runs OCR glyph by glyph.
+        tile_columns: Tile each OCR batch into one image with this many columns (optional).
+        recognition_only: Skip text detection and run only the recognition model on each glyph;
+            False falls back to the full OCR pipeline.
+        fallback_workers: Number of threads matching OCR failures against the standard fonts.
+        std_font_bank: Preloaded standard fonts for fallback; built from std_font_dict, guest_range
+            and TRUE_FONT_PATH when not given.
+        glyph_cache: Cross-font cache keyed by glyph outline hash (optional). Glyphs seen in an
+            earlier font skip OCR and fallback; newly resolved glyphs are stored in it.
+        summary_interval: Log per-font outcome counts at most once per this many seconds;
+            per-glyph lines are only logged when the glyph loggers are enabled.
+        metrics: Collects wall and CPU time per stage (font_load, glyph_cache, render,
+            ocr_preprocess, ocr_inference, fallback_prune, fallback_score, merge), outcome
+            counters and per-glyph latency histograms (optional).
 
     Returns:
         A dictionary mapping font characters to their recognized characters:
@@ -345,90 +543,142 @@ def extract_characters_unified_workflow(font_path: str, std_font_dict=None, gues
             font_char: 'recognized_char'
         }
     """
-    print("=== UNIFIED WORKFLOW: PaddleOCR + Fallback ===")
+    logger.info("=== UNIFIED WORKFLOW: PaddleOCR + Fallback ===")
     
     # Extract characters from font file (reuse existing logic)
-    if font_path.lower().endswith('.woff2'):
-        with open(font_path, 'rb') as f:
-            font_bytes = f.read()
-        ttf_font = woff2_to_ttf(font_bytes)
-        temp_ttf_file = io.BytesIO()
-        ttf_font.save(temp_ttf_file)
-        temp_ttf_file.seek(0)
-        pil_font = ImageFont.truetype(temp_ttf_file, FONT_SIZE)
-        characters = set()
-        for table in ttf_font['cmap'].tables:
-            for char_code in table.cmap:
-                character = chr(char_code)
-                characters.add(character)
-        characters = list(characters)
-        print(f"First 10 characters from font (WOFF2): {characters[:10]}")
-
-    elif font_path.lower().endswith('.ttf') or font_path.lower().endswith('.otf'):
-        pil_font = ImageFont.truetype(font_path, FONT_SIZE)
-        ft_font = ttFont.TTFont(font_path)
-        characters = set()
-        for table in ft_font['cmap'].tables:
-            for char_code in table.cmap:
-                character = chr(char_code)
-                characters.add(character)
-        characters = list(characters)
-    else:
-        raise ValueError("Unsupported font format. Please provide a WOFF2, TTF, or OTF file.")
+    # Format is sniffed from magic bytes; cmap and the Pillow font come from one parse
+    with timed(metrics, "font_load"):
+        font = font_path if isinstance(font_path, LoadedFont) else LoadedFont(font_path)
+        pil_font = font.pil_font(FONT_SIZE)
+        characters = font.characters
+    logger.info("First 10 characters from font (%s): %s", font.format.upper(), characters[:10])
+    summary = GlyphSummary(logger, font.name or font.hashsum, summary_interval)
 
     # Apply character limit if specified
     characters_to_process = characters
     if limit_chars is not None and limit_chars > 0:
         characters_to_process = characters_to_process[:limit_chars]
-        print(f"Limited processing to first {limit_chars} characters")
-    
-    print(f"Processing {len(characters_to_process)} characters")
+        logger.info("Limited processing to first %d characters", limit_chars)
     
+    logger.info("Processing %d characters", len(characters_to_process))
+
+    # Phase 0: Reuse glyphs whose outline was already resolved in another font
+    cached_results = {}
+    # Image-similarity hits do not skip OCR, which may still improve on them;
+    # they only stand in for the fallback phase
+    cached_image_results = {}
+    if glyph_cache is not None:
+        with timed(metrics, "glyph_cache"):
+            outline_hashes = font.outline_hashes
+            cached = glyph_cache.get_many(outline_hashes[char] for char in characters_to_process)
+            for char in characters_to_process:
+                hit = cached.get(outline_hashes[char])
+                if hit is None:
+                    continue
+                if hit[1] in (SOURCE_OCR, SOURCE_QUICK):
+                    cached_results[char] = hit[0]
+                else:
+                    cached_image_results[char] = hit[0]
+        characters_to_process = [char for char in characters_to_process if char not in cached_results]
+        summary.record("glyph_cache_hit", len(cached_results))
+        logger.info("Glyph cache: %d hits, %d to process", len(cached_results), len(characters_to_process))
+
     # Phase 1: Run PaddleOCR on all characters
-    print("\n--- Phase 1: PaddleOCR Processing ---")
+    logger.info("--- Phase 1: PaddleOCR Processing ---")
     ocr_results = {}
     failed_characters = []
     
+    if not characters_to_process:
+        batch_results = {}
+    elif batch_size > 1:
+        batch_results = extract_characters_ocr_batch(
+            characters_to_process, pil_font, confidence_threshold=0.95,
+            batch_size=batch_size, tile_columns=tile_columns, recognition_only=recognition_only,
+            summary=summary, metrics=metrics)
+    else:
+        batch_results = {
+            char: extract_single_character_ocr(char, pil_font, confidence_threshold=0.95,
+                                               recognition_only=recognition_only, summary=summary,
+                                               metrics=metrics)
+            for char in characters_to_process
+        }
+
     for char in characters_to_process:
-        recognized_char, confidence = extract_single_character_ocr(char, pil_font, confidence_threshold=0.95)
+        recognized_char, confidence = batch_results[char]
         if recognized_char is not None:
             ocr_results[char] = recognized_char
         else:
             failed_characters.append(char)
     
-    print(f"OCR Results: {len(ocr_results)} successes, {len(failed_characters)} failures")
+    logger.info("OCR Results: %d successes, %d failures", len(ocr_results), len(failed_characters))
     
     # Phase 2: Apply fallback to failed characters only
-    print("\n--- Phase 2: Fallback Processing for Failed Characters ---")
+    logger.info("--- Phase 2: Fallback Processing for Failed Characters ---")
     fallback_results = {}
     
-    if failed_characters and std_font_dict and guest_range and TRUE_FONT_PATH:
-        print(f"Processing {len(failed_characters)} failed characters with image similarity")
+    for char in [char for char in failed_characters if char in cached_image_results]:
+        fallback_results[char] = cached_image_results[char]
+        failed_characters.remove(char)
+        summary.record("glyph_cache_image_hit")
+
+    if failed_characters and std_font_bank is None and std_font_dict and guest_range and TRUE_FONT_PATH:
+        std_font_bank = StandardFontBank.from_cache(std_font_dict.keys(), TRUE_FONT_PATH, guest_range)
+
+    if failed_characters and std_font_bank is not None:
+        logger.info("Processing %d failed characters with image similarity", len(failed_characters))
         
+        # Render in this thread; only the read-only matching is shared out to the pool
+        char_images = {}
         for char in failed_characters:
             try:
                 # Use the same draw function as in slow.py for consistency
-                char_image = draw(char, pil_font, IMAGE_SIZE)
-                
-                # Use image similarity fallback
-                fallback_result = match_test_im_with_cache(char_image, std_font_dict, guest_range, TRUE_FONT_PATH)
-                if fallback_result:
-                    fallback_results[char] = fallback_result
-                    print(f"FALLBACK SUCCESS: '{char}' (U+{ord(char):04X}) -> '{fallback_result}'")
-                else:
-                    print(f"FALLBACK FAILED: '{char}' (U+{ord(char):04X}) - no match found")
-                    
+                with timed(metrics, "render", 1):
+                    char_images[char] = draw(char, pil_font, IMAGE_SIZE)
             except Exception as e:
-                print(f"FALLBACK ERROR: '{char}' - {str(e)}")
+                glyph_logger.debug("FALLBACK ERROR: %r - %s", char, e)
+                summary.record("fallback_error")
+
+        try:
+            # Use image similarity fallback; results come back in input order,
+            # so they do not depend on the worker count
+            matched = std_font_bank.match_many(list(char_images.values()), workers=fallback_workers,
+                                               metrics=metrics)
+        except Exception as e:
+            logger.warning("FALLBACK ERROR: %d characters - %s", len(char_images), e)
+            summary.record("fallback_error", len(char_images))
+            matched = []
+
+        for char, fallback_result in zip(char_images.keys(), matched):
+            if fallback_result:
+                fallback_results[char] = fallback_result
+                glyph_logger.debug("FALLBACK SUCCESS: %r (U+%04X) -> %r", char, ord(char), fallback_result)
+                summary.record("fallback_success")
+            else:
+                glyph_logger.debug("FALLBACK FAILED: %r (U+%04X) - no match found", char, ord(char))
+                summary.record("fallback_failed")
     elif failed_characters:
-        print(f"Skipping fallback for {len(failed_characters)} characters (fallback parameters not provided)")
+        logger.info("Skipping fallback for %d characters (fallback parameters not provided)", len(failed_characters))
     
     # Phase 3: Combine results
-    print("\n--- Phase 3: Combining Results ---")
-    final_results = {}
-    final_results.update(ocr_results)
-    final_results.update(fallback_results)
-    
-    print(f"Final Results: {len(ocr_results)} from OCR + {len(fallback_results)} from fallback = {len(final_results)} total")
-    
+    logger.info("--- Phase 3: Combining Results ---")
+    with timed(metrics, "merge"):
+        final_results = {}
+        final_results.update(cached_results)
+        final_results.update(ocr_results)
+        final_results.update(fallback_results)
+
+        if glyph_cache is not None:
+            glyph_cache.put_many(
+                [(outline_hashes[char], result, SOURCE_OCR) for char, result in ocr_results.items()]
+                + [(outline_hashes[char], result, SOURCE_IMAGE) for char, result in fallback_results.items()]
+            )
+
+    logger.info("Final Results: %d from glyph cache + %d from OCR + %d from fallback = %d total",
+                len(cached_results), len(ocr_results), len(fallback_results), len(final_results))
+    summary.flush()
+    if metrics is not None:
+        metrics.count("glyphs", len(characters))
+        for event, n in summary.counts.items():
+            metrics.count(event, n)
+
     return final_results
@@ -1,9 +1,15 @@
-from copy import deepcopy
 from typing import Union
 
+import numpy as np
 from fontTools.ttLib import ttFont
 
-from lib import load_std_font_coord_table
+from functools import lru_cache
+
+from glyph_cache import GlyphCache, SOURCE_QUICK
+from lib import CoorTable, get_glyph_outline_hashes, load_compiled_std_font_coord_table
+
+# noinspection PyPep8Naming
+FUZZ = 20
 
 
 def list_ttf_characters(ttf: ttFont.TTFont) -> list[str]:
@@ -26,53 +32,107 @@ def get_character_coor_table_from_font(character: str, ttf: ttFont.TTFont) \
     return coord_list
 
 
-def get_font_coor_table(ttf: ttFont.TTFont) -> dict[str, list[tuple[int, int]]]:
-    """输入 ttf 对象，输出相应的 coord table"""
-    characters = list_ttf_characters(ttf)
-    font_coord_table = dict(zip(
-        characters,
-        map(
-            lambda x: get_character_coor_table_from_font(x, ttf),
-            characters
-        )
-    ))
-
-    return font_coord_table
+def get_font_coor_table(ttf: ttFont.TTFont) -> CoorTable:
+    """输入 ttf 对象，输出相应的 coord table（CSR 形式，只查询一次 cmap）"""
+    cmap = ttf.getBestCmap()
+    glyf = ttf['glyf']
+    return CoorTable.from_items(
+        (chr(code), glyf[glyf_name].coordinates)
+        for code, glyf_name in cmap.items()
+    )
 
 
-def is_glpyh_similar(a: list[tuple[int, int]], b: list[tuple[int, int]], fuzz: int) -> bool:
+def is_glpyh_similar(a, b, fuzz: int) -> bool:
     """
-    比较两字符 coor 是否相似。
+    比较两字符 coor 是否相似：点数相同且各点坐标差绝对值均不超过 fuzz。
     来自：https://github.com/fffonion/JJGet/blob/master/scripts/generate_font.py#L37-L45
     """
     if len(a) != len(b):
         return False
-    found = True
-    for ii in range(len(a)):
-        if abs(a[ii][0] - b[ii][0]) > fuzz or abs(a[ii][1] - b[ii][1]) > fuzz:
-            found = False
-            break
-    return found
+    if len(a) == 0:
+        return True
+    diff = np.asarray(a, dtype=np.int32) - np.asarray(b, dtype=np.int32)
+    return bool(np.abs(diff).max() <= fuzz)
+
 
+class CoorIndex:
+    """
+    标准 coordTable 索引：按点数及首点量化坐标分桶。
+    桶宽大于 fuzz，故相似字符的首点必落在相邻桶内，查询时只需探查 3x3 个桶，
+    再对候选做向量化的最大绝对差核对。
+    """
 
-def match_font(ttf: ttFont.TTFont) -> Union[tuple[dict[str, str], str], tuple[dict[str, str], list[str]]]:
-    """输入晋江文学城字体对应的 ttf 对象，输出匹配后结果"""
-    std_coord_table = load_std_font_coord_table()
+    def __init__(self, std_coord_table: CoorTable, fuzz: int):
+        self.std_coord_table = std_coord_table
+        self.fuzz = fuzz
+        self.cell = fuzz + 1
+        # 同点数的标准条目堆叠为 (m, n, 2) 数组
+        self.groups: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self.buckets: dict[tuple[int, int, int], list[int]] = {}
+        for n, idx in std_coord_table.point_count_groups.items():
+            coords = std_coord_table.stack(idx, n)
+            self.groups[n] = (idx, coords)
+            for pos in range(len(idx)):
+                self.buckets.setdefault(self._key(coords[pos]), []).append(pos)
+
+    def _key(self, coords, dx: int = 0, dy: int = 0) -> tuple[int, int, int]:
+        if len(coords) == 0:
+            return 0, 0, 0
+        x, y = coords[0]
+        return len(coords), int(x) // self.cell + dx, int(y) // self.cell + dy
+
+    def lookup(self, coords) -> list[int]:
+        """返回与 coords 相似的标准条目下标，升序排列"""
+        group = self.groups.get(len(coords))
+        if group is None:
+            return []
+        idx, group_coords = group
+        if len(coords) == 0:
+            return idx.tolist()
+        positions = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                positions.extend(self.buckets.get(self._key(coords, dx, dy), []))
+        if not positions:
+            return []
+        positions = np.array(positions, dtype=np.intp)
+        diff = np.abs(group_coords[positions] - np.asarray(coords, dtype=np.int32)).max(axis=(1, 2))
+        return np.sort(idx[positions[diff <= self.fuzz]]).tolist()
+
+
+@lru_cache
+def _get_coor_index(std_coord_table: CoorTable, fuzz: int) -> CoorIndex:
+    return CoorIndex(std_coord_table, fuzz)
+
+
+def load_std_coor_index(COORD_TABLE_PATH, fuzz: int = FUZZ) -> CoorIndex:
+    """载入标准 coordTable 并建立索引，每个进程只建立一次；JSON 变化时随之重建"""
+    return _get_coor_index(load_compiled_std_font_coord_table(COORD_TABLE_PATH), fuzz)
+
+
+def match_font(ttf: ttFont.TTFont, COORD_TABLE_PATH,
+               glyph_cache: GlyphCache | None = None) -> Union[tuple[dict[str, str], str], tuple[dict[str, str], list[str]]]:
+    """输入晋江文学城字体对应的 ttf 对象，输出匹配后结果；给出 glyph_cache 时将匹配结果写入字形缓存"""
+    index = load_std_coor_index(COORD_TABLE_PATH, FUZZ)
+    std_coord_table = index.std_coord_table
     ttf_coord_table = get_font_coor_table(ttf)
 
     # 移除晋江文学城字体 X 字符
-    _ttf_coordTable = deepcopy(ttf_coord_table)
-    _ttf_coordTable.pop('x', None)
+    _ttf_coordTable = {char: coords for char, coords in ttf_coord_table.items() if char != 'x'}
 
     out = {}
 
-    # noinspection PyPep8Naming
-    FUZZ = 20
-    for jj_std_item in std_coord_table:
-        for ttf_item in _ttf_coordTable.items():
-            if is_glpyh_similar(jj_std_item[1], ttf_item[1], FUZZ):
-                out[ttf_item[0]] = jj_std_item[0]
-                break
+    # 每个标准条目取第一个与之相似的字体字符，与逐一比较的结果一致
+    first_match = {}
+    for ttf_item in _ttf_coordTable.items():
+        for std_i in index.lookup(ttf_item[1]):
+            first_match.setdefault(std_i, ttf_item[0])
+    for std_i in sorted(first_match):
+        out[first_match[std_i]] = std_coord_table.chars[std_i]
+
+    if glyph_cache is not None:
+        outline_hashes = get_glyph_outline_hashes(ttf, out.keys())
+        glyph_cache.put_many((outline_hashes[char], result, SOURCE_QUICK) for char, result in out.items())
 
     if len(_ttf_coordTable) == len(out):
         return out, "OK"
@@ -0,0 +1,121 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+from PIL import Image, ImageFont
+
+from matcher import pack_black_bits
+
+# 默认缓存上限 32 MiB，约合 2400 张未打包的 116x116 字符图像
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def font_content_hash(font: ImageFont.FreeTypeFont) -> str:
+    """
+    求出 Pillow 字体所用字体数据的 sha1，结果保存在字体对象上。
+    以内容而非对象标识作缓存键，不同对象载入同一字体可共享缓存，对象被回收后其键也不会被新字体误用。
+    """
+    content_hash = getattr(font, 'content_hash', None)
+    if content_hash is None:
+        if isinstance(font.path, (str, bytes)):
+            with open(font.path, 'rb') as f:
+                data = f.read()
+        elif isinstance(font.path, io.BytesIO):
+            data = font.path.getvalue()
+        else:
+            font.path.seek(0)
+            data = font.path.read()
+        content_hash = hashlib.sha1(data).hexdigest()
+        font.content_hash = content_hash
+    return content_hash
+
+
+class RenderCache:
+    """
+    字符图像缓存，键为 (字体内容哈希, 字号, 字符, 图像大小)。
+    按占用字节数淘汰最久未使用的条目；packed 为 True 时按位打包保存，约为原图的 1/8。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, packed: bool = False):
+        self.max_bytes = max_bytes
+        self.packed = packed
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries: OrderedDict[tuple, tuple[Image.Image | np.ndarray, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _unpack(bits: np.ndarray, size: tuple[int, int]) -> Image.Image:
+        width, height = size
+        black = np.unpackbits(bits.view(np.uint8), count=width * height).reshape(height, width)
+        return Image.fromarray(black == 0)
+
+    def get_or_render(self, key: tuple, size: tuple[int, int], render: Callable[[], Image.Image]) -> Image.Image:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            value = entry[0]
+            return self._unpack(value, size) if self.packed else value
+
+        image = render()
+        if self.packed:
+            value = pack_black_bits(np.asarray(image))
+            nbytes = value.nbytes
+        else:
+            # "1" 模式图像在 Pillow 内部每像素占一字节
+            value = image
+            nbytes = image.width * image.height
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self.bytes += nbytes
+                self._evict()
+        return image
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.bytes -= nbytes
+            self.evictions += 1
+
+    def configure(self, max_bytes: int | None = None, packed: bool | None = None):
+        """调整缓存上限或保存方式；改变保存方式时清空缓存"""
+        with self._lock:
+            if packed is not None and packed != self.packed:
+                self.packed = packed
+                self._entries.clear()
+                self.bytes = 0
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, int | float]:
+        """命中、未命中、淘汰次数及当前条目数与占用字节数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,152 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'results.sqlite3')
+# 默认缓存上限 256 MiB
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    以字体 sha1、引擎名及版本、参数为键的持久化识别结果缓存（SQLite）。
+    超出 max_bytes 时按最近使用时间淘汰最旧的条目。
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                hashsum TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                params TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_hashsum ON results (hashsum)')
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def make_key(hashsum: str, engine: str, params: dict) -> str:
+        """由字体 sha1、引擎（含版本）及参数求出缓存键"""
+        payload = json.dumps([hashsum, engine, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, hashsum: str, engine: str, params: dict) -> dict[str, str] | None:
+        key = self.make_key(hashsum, engine, params)
+        row = self._conn.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, hashsum: str, engine: str, params: dict, result: dict[str, str]):
+        key = self.make_key(hashsum, engine, params)
+        result_json = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, hashsum, engine, json.dumps(params, sort_keys=True, ensure_ascii=False),
+             result_json, len(result_json.encode('utf-8')), now, now)
+        )
+        self._conn.commit()
+        self.evict()
+
+    def total_size(self) -> int:
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """淘汰最久未使用的条目直至总大小不超过 max_bytes，返回淘汰条数"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        excess = self.total_size() - max_bytes
+        if excess <= 0:
+            return 0
+        evicted = 0
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM results ORDER BY last_used'):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+            evicted += 1
+        self._conn.executemany('DELETE FROM results WHERE key = ?', keys)
+        self._conn.commit()
+        return evicted
+
+    def purge(self, hashsum: str | None = None, older_than: float | None = None) -> int:
+        """删除指定字体或早于 older_than 秒前使用的条目；均未指定时清空缓存"""
+        sql = 'DELETE FROM results'
+        clauses = []
+        args = []
+        if hashsum is not None:
+            clauses.append('hashsum = ?')
+            args.append(hashsum)
+        if older_than is not None:
+            clauses.append('last_used < ?')
+            args.append(time.time() - older_than)
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        deleted = self._conn.execute(sql, args).rowcount
+        self._conn.commit()
+        return deleted
+
+    def entries(self) -> list[tuple[str, str, str, int, float]]:
+        """列出 (hashsum, engine, params, size, last_used)，最近使用者在前"""
+        return self._conn.execute(
+            'SELECT hashsum, engine, params, size, last_used FROM results ORDER BY last_used DESC'
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge the font result cache")
+    parser.add_argument('--path', default=DEFAULT_CACHE_PATH, help="SQLite cache file")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help="Show entry count and total size")
+    subparsers.add_parser('list', help="List cached fonts, most recently used first")
+    purge_parser = subparsers.add_parser('purge', help="Delete cached results")
+    purge_parser.add_argument('--hashsum', help="Only results for this font sha1")
+    purge_parser.add_argument('--older-than', type=float, help="Only results unused for this many days")
+    purge_parser.add_argument('--all', action='store_true', help="Delete every result")
+    evict_parser = subparsers.add_parser('evict', help="Evict least recently used results down to a size")
+    evict_parser.add_argument('--max-mb', type=float, required=True)
+    args = parser.parse_args()
+
+    with ResultCache(args.path) as cache:
+        if args.command == 'stats':
+            print(f"{len(cache.entries())} entries, {cache.total_size() / 1024 / 1024:.2f} MiB in {args.path}")
+        elif args.command == 'list':
+            for hashsum, engine, params, size, last_used in cache.entries():
+                print(f"{hashsum}  {engine}  {size:>9} B  "
+                      f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_used))}  {params}")
+        elif args.command == 'purge':
+            if args.hashsum is None and args.older_than is None and not args.all:
+                parser.error("purge needs --hashsum, --older-than or --all")
+            older_than = args.older_than * 86400 if args.older_than is not None else None
+            print(f"Deleted {cache.purge(args.hashsum, older_than)} entries")
+        elif args.command == 'evict':
+            print(f"Evicted {cache.evict(int(args.max_mb * 1024 * 1024))} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
+import io
 import json
+import logging
 import math
-from functools import lru_cache
+import time
+from functools import cached_property, lru_cache, partial
 from typing import IO
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 # from matplotlib import pyplot as plt
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
@@ -10,13 +14,26 @@ from fontTools.ttLib import ttFont
 from tqdm import tqdm
 from commonly_used_character import character_list_7000 as character_list
 from exception import ImageMatchError
+from glyph_cache import GlyphCache, SOURCE_IMAGE
+from matcher import (
+    PackedTestArray, StackedFont, match_test_array, match_test_array_with_rows, pack_black_bits, popcount,
+    prune_candidates, score_candidates
+)
+from metrics import WorkflowMetrics
 from quick import list_ttf_characters
-from lib import load_std_font_coord_table
+from render_cache import RenderCache, font_content_hash
+from lib import FileLock, LoadedFont, atomic_write, get_glyph_outline_hashes, load_compiled_std_font_coord_table
+
+logger = logging.getLogger(__name__)
 
 # 默认字号 32 px
 # 行高 1.2 倍
 FONT_SIZE = 96
 IMAGE_SIZE = (math.ceil(FONT_SIZE * 1.2), math.ceil(FONT_SIZE * 1.2))
+# 并行生成标准字体缓存时每个任务绘制的字符数
+STD_RENDER_CHUNK_SIZE = 500
+# 旧版无清单的标准字体缓存，沿用前抽样重新绘制比对的字符数
+STD_CACHE_SAMPLES = 8
 
 @lru_cache
 def _load_font(font, size=FONT_SIZE):
@@ -32,10 +49,8 @@ def load_std_guest_range(COORD_TABLE_PATH) -> list[str]:
     return list(set(
         filter(
             lambda x: x != 'x',
-            map(
-                lambda x: x[0],
-                load_std_font_coord_table(COORD_TABLE_PATH)
-            ))
+            load_compiled_std_font_coord_table(COORD_TABLE_PATH).chars
+        )
     ))
 
 
@@ -61,28 +76,17 @@ def _get_offset(im: Image, font: ImageFont.FreeTypeFont, text: str):
 
 # left, upper, right, lower
 def getbbox(image: Image.Image):
-    pixels = image.load()  # 加载像素数据
     width, height = image.size
-    x1 = width
-    y1 = height
-    x2 = -1
-    y2 = -1
-
-    for x in range(width):
-        for y in range(height):
-            if pixels[x, y] == 0:  # Assuming black is represented by 0
-                x1 = min(x1, x)
-                y1 = min(y1, y)
-                x2 = max(x2, x)
-                y2 = max(y2, y)
-    if x1 == width:
-        x1 = 0
-    if y1 == height:
-        y1 = 0
-    if x2 == -1:
-        x2 = width - 1
-    if y2 == -1:
-        y2 = height - 1
+    black = np.asarray(image) == 0  # Assuming black is represented by 0
+    # 按列、按行归约，求出含黑色像素的首末列与首末行
+    cols = np.flatnonzero(black.any(axis=0))
+    rows = np.flatnonzero(black.any(axis=1))
+    if cols.size:
+        x1, x2 = int(cols[0]), int(cols[-1])
+        y1, y2 = int(rows[0]), int(rows[-1])
+    else:
+        x1, y1 = 0, 0
+        x2, y2 = width - 1, height - 1
     len = max(x2 - x1, max(0, y2 - y1)) // 2
     xmid = (x1 + x2) // 2
     ymid = (y1 + y2) // 2
@@ -92,8 +96,17 @@ def getbbox(image: Image.Image):
     y2 = min(ymid + len, height - 1)
     return x1, y1, x2, y2
 
-@lru_cache(maxsize=3500)
+# 进程内共享的字符图像缓存，按字节数限制大小
+render_cache = RenderCache()
+
+
 def draw(text: str, font: ImageFont.FreeTypeFont, size: tuple[int, int] = IMAGE_SIZE):
+    size = tuple(size)
+    key = (font_content_hash(font), font.size, text, size)
+    return render_cache.get_or_render(key, size, lambda: _draw(text, font, size))
+
+
+def _draw(text: str, font: ImageFont.FreeTypeFont, size: tuple[int, int]):
     image = Image.new("1", size, "white")
     d = ImageDraw.Draw(image)
     d.text(_get_offset(image, font, text), text, font=font, fill="black")
@@ -146,74 +159,49 @@ def compare_im_np(test_array: np.ndarray, std_array: np.ndarray):
     return rate
 
 
-def init_true_font(std_font_dict, TRUE_FONT_PATH, COORD_TABLE_PATH):
+def _get_true_font_lock_path(TRUE_FONT_PATH) -> str:
+    return os.path.join(TRUE_FONT_PATH, '.init_true_font.lock')
+
+
+def init_true_font(std_font_dict, TRUE_FONT_PATH, COORD_TABLE_PATH, workers: int = 1):
+    # 同一时刻只有一个进程生成缓存，其余进程等待其完成后直接使用
+    with FileLock(_get_true_font_lock_path(TRUE_FONT_PATH)):
+        _init_true_font(std_font_dict, TRUE_FONT_PATH, COORD_TABLE_PATH, workers)
+
+
+def _init_true_font(std_font_dict, TRUE_FONT_PATH, COORD_TABLE_PATH, workers: int = 1):
+    guest_range = _get_std_guest_range(COORD_TABLE_PATH)
     for std_font in std_font_dict.keys():
         NPZ_PATH = os.path.join(TRUE_FONT_PATH, std_font + '.npz')
+        BITS_PATH = os.path.join(TRUE_FONT_PATH, std_font + '.bits.npy')
+        if exists_std_im_bits(BITS_PATH) is not True and os.path.exists(NPZ_PATH):
+            # 由旧版逐字符 npz 转换，无需重新绘制
+            convert_std_im_np_arrays(NPZ_PATH, BITS_PATH)
+    if workers > 1:
+        update_std_font_caches(std_font_dict, TRUE_FONT_PATH, guest_range, workers)
+        return
+    for std_font in std_font_dict.keys():
+        BITS_PATH = os.path.join(TRUE_FONT_PATH, std_font + '.bits.npy')
         JSON_PATH = os.path.join(TRUE_FONT_PATH, std_font + '.json')
-        if os.path.exists(NPZ_PATH) is not True:
-            save_std_im_np_arrays(std_font_dict.get(std_font),
-                                COORD_TABLE_PATH,
-                                NPZ_PATH)
-        if os.path.exists(JSON_PATH) is not True:
-            save_std_im_black_point_rates(
-                std_font_dict.get(std_font),
-                COORD_TABLE_PATH,
-                JSON_PATH)
-
-
-def match_test_im_with_cache(test_im: Image, std_font, guest_range: list[str], TRUE_FONT_PATH):
-    test_array = np.asarray(test_im)
-    npz_dict = {}
-    josn_dict = {}
+        kept, rendered = update_std_font_cache(std_font_dict.get(std_font), guest_range, BITS_PATH, JSON_PATH)
+        if rendered:
+            logger.info("%s: kept %d cached characters, rendered %d", std_font, kept, rendered)
+
+
+def match_test_im_with_cache(test_im: Image, std_font, guest_range: list[str], TRUE_FONT_PATH,
+                             top_k: int | None = None):
+    fonts = []
     for std_font_name in std_font.keys():
-        NPZ_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.npz')
-        npz_dict[' '.join(std_font_name)] = load_std_im_np_arrays(NPZ_PATH)
+        BITS_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.bits.npy')
         JSON_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.json')
-        josn_dict[' '.join(std_font_name)] = load_std_im_black_point_rates(JSON_PATH)
-    most_match_rate: float = 0.0
-    most_match: str = ''
-
-    test_im_black_point_rate = get_im_black_point_rate(test_im)
-    if test_im_black_point_rate == 0:
-        text = ''
-        return text
-        
-    for text in guest_range:
-        for true_font_names in std_font.keys():
-            std_im_np_arrays = npz_dict.get(' '.join(true_font_names))
-            std_im_black_point_rates = josn_dict.get(' '.join(true_font_names))
-            # if text != '「':
-            #     continue
-            if text not in std_im_np_arrays:
-                continue
-            if abs(test_im_black_point_rate - std_im_black_point_rates[text]) / test_im_black_point_rate > 0.2:
-                # 跳过黑色比例相较其自身差异 20% 以上的标准字符
-                continue
-            std_array = std_im_np_arrays[text]
-            match_rate = compare_im_np(test_array, std_array)
-            if match_rate > most_match_rate:
-                most_match = text
-                most_match_rate = match_rate
-    return most_match
-
-
-def save_std_im_np_arrays(std_font: ImageFont.FreeTypeFont, COORD_TABLE_PATH:str, npz_path: str):
-    guest_range = list(
-        {*load_std_guest_range(COORD_TABLE_PATH), *character_list})
-
-    npz_dict = {}
-
-    for text in guest_range:
-        std_im = draw(text, std_font)
-        std_array = np.asarray(std_im)
-        npz_dict[text] = std_array
-
-    np.savez_compressed(npz_path, **npz_dict)
+        fonts.append(load_std_stacked_font(BITS_PATH, JSON_PATH))
+    return match_test_array(np.asarray(test_im), fonts, guest_range, top_k)
 
 
 @lru_cache
 def load_std_im_np_arrays(npz_path: str):
-    with np.load(npz_path, mmap_mode='r') as _std_im_np_arrays:
+    # npz 为压缩归档，无法 mmap，只能整体解压
+    with np.load(npz_path) as _std_im_np_arrays:
         std_im_np_arrays = {}
         for key in _std_im_np_arrays.keys():
             std_im_np_arrays[key] = _std_im_np_arrays.get(key)
@@ -221,24 +209,338 @@ def load_std_im_np_arrays(npz_path: str):
     return std_im_np_arrays
 
 
-def get_im_black_point_rate(im: Image):
-    std_array = np.asarray(im)
-    std_black_array = std_array == False
-    return np.count_nonzero(std_black_array) / std_array.size
+def _get_std_im_bits_index_path(bits_path: str) -> str:
+    return os.path.splitext(bits_path)[0] + '.json'
+
+
+def _get_std_guest_range(COORD_TABLE_PATH: str) -> list[str]:
+    """标准字体缓存应包含的字符，排序以使缓存内容与清单可复现"""
+    return sorted({*load_std_guest_range(COORD_TABLE_PATH), *character_list})
+
+
+def _get_std_font_manifest(std_font: ImageFont.FreeTypeFont) -> dict:
+    """标准字体缓存清单：字体内容哈希及绘制参数，任一变化即须全部重新绘制"""
+    return {
+        "font_hash": font_content_hash(std_font),
+        "render": {"font_size": std_font.size, "image_size": list(IMAGE_SIZE)},
+    }
+
+
+def _save_std_im_bits(bits_path: str, chars: list[str], bits: np.ndarray, shape: tuple[int, int],
+                      manifest: dict | None = None):
+    # 不压缩保存，以便 np.load 真正以 mmap 方式载入，多进程共享页面
+    with atomic_write(bits_path, 'wb') as f:
+        np.save(f, bits)
+    # 字符索引最后写入，索引存在即表示缓存完整
+    with atomic_write(_get_std_im_bits_index_path(bits_path), 'w') as f:
+        json.dump({**(manifest or {}), "shape": list(shape), "chars": chars}, f)
+
 
+def _load_std_im_bits_index(bits_path: str) -> dict:
+    with open(_get_std_im_bits_index_path(bits_path), 'r') as f:
+        return json.load(f)
+
+
+def render_std_chars(std_font: ImageFont.FreeTypeFont, chars: list[str]) -> tuple[np.ndarray, list[float]]:
+    """
+    绘制标准字体的指定字符，一次绘制同时求出按位打包的图像及黑色比例。
+    直接调用 _draw，不占用渲染缓存。
+    """
+    arrays = np.stack([np.asarray(_draw(text, std_font, IMAGE_SIZE)) for text in chars])
+    bits = pack_black_bits(arrays)
+    size = arrays[0].size
+    return bits, [int(n) / size for n in popcount(bits)]
+
+
+def _matches_std_font_samples(std_font: ImageFont.FreeTypeFont, chars: list[str], bits: np.ndarray,
+                              shape: tuple[int, int], samples: int = STD_CACHE_SAMPLES) -> bool:
+    """从缓存中均匀抽取 samples 个字符重新绘制，与缓存的位图逐行比对"""
+    if not chars or shape != (IMAGE_SIZE[1], IMAGE_SIZE[0]) or len(bits) != len(chars):
+        return False
+    rows = sorted({round(i * (len(chars) - 1) / max(samples - 1, 1)) for i in range(samples)})
+    sample_bits, _ = render_std_chars(std_font, [chars[row] for row in rows])
+    return np.array_equal(sample_bits, bits[rows])
+
+
+class StdFontCacheUpdate:
+    """
+    标准字体缓存（按位打包图像、字符索引及黑色比例）的一次增量更新：
+    load 读取现有缓存并与清单比对，求出缺少的字符；save 将新绘制的字符与沿用的字符合并，
+    按 guest_range 的顺序写出，并去掉 guest_range 中已不再包含的字符，
+    故增量更新的结果与重新生成同一字符集的缓存相同。
+    字体内容或绘制参数与清单不符时全部重新绘制；旧版无清单的缓存抽样重新绘制几个字符比对，
+    一致时才沿用并补写清单，否则同样全部重新绘制。
+    """
+
+    def __init__(self, manifest: dict, guest_range: list[str], bits_path: str, josn_path: str):
+        self.manifest = manifest
+        self.bits_path = bits_path
+        self.josn_path = josn_path
+        self.chars: list[str] = []
+        self.bits: np.ndarray | None = None
+        self.shape = (IMAGE_SIZE[1], IMAGE_SIZE[0])
+        self.black_point_rates: dict[str, float] = {}
+        self.up_to_date = False
+        self._guest_range = guest_range
+
+    @classmethod
+    def load(cls, std_font: ImageFont.FreeTypeFont, guest_range: list[str], bits_path: str, josn_path: str):
+        update = cls(_get_std_font_manifest(std_font), guest_range, bits_path, josn_path)
+        if exists_std_im_bits(bits_path):
+            index = _load_std_im_bits_index(bits_path)
+            if all(index.get(key, value) == value for key, value in update.manifest.items()):
+                bits = np.load(bits_path)
+                stamped = all(key in index for key in update.manifest)
+                if stamped or _matches_std_font_samples(std_font, index['chars'], bits, tuple(index['shape'])):
+                    update.chars = index['chars']
+                    update.bits = bits
+                    update.shape = tuple(index['shape'])
+                    update.up_to_date = stamped
+                else:
+                    logger.info("%s does not match the current standard font, rebuilding", bits_path)
+
+        if update.chars and os.path.exists(josn_path):
+            with open(josn_path, 'r') as f:
+                update.black_point_rates = json.load(f)
+        else:
+            update.up_to_date = False
+        if update.chars:
+            # 黑色比例可由已缓存的位图直接求出，无需重新绘制
+            size = update.shape[0] * update.shape[1]
+            for text, n in zip(update.chars, popcount(update.bits)):
+                if text not in update.black_point_rates:
+                    update.black_point_rates[text] = int(n) / size
+                    update.up_to_date = False
+        return update
+
+    @cached_property
+    def wanted(self) -> list[str]:
+        """缓存应包含的字符，去重后按 guest_range 的顺序"""
+        return list(dict.fromkeys(self._guest_range))
+
+    @cached_property
+    def missing(self) -> list[str]:
+        """guest_range 中缓存尚未包含的字符"""
+        existing = set(self.chars)
+        return [text for text in self.wanted if text not in existing]
+
+    @property
+    def kept(self) -> int:
+        """沿用的已缓存字符数"""
+        return len(self.wanted) - len(self.missing)
+
+    @property
+    def needs_save(self) -> bool:
+        return not self.up_to_date or self.chars != self.wanted
+
+    def save(self, missing_bits: np.ndarray | None = None, missing_rates: list[float] | None = None):
+        """
+        合并 missing 字符的位图及黑色比例（顺序与 missing 一致）与已缓存的字符，
+        按 wanted 的顺序写出缓存
+        """
+        chars = self.chars
+        bits = self.bits
+        black_point_rates = dict(self.black_point_rates)
+        if self.missing:
+            bits = missing_bits if bits is None else np.concatenate([bits, missing_bits])
+            chars = chars + self.missing
+            black_point_rates.update(zip(self.missing, missing_rates))
+        if chars != self.wanted:
+            rows = {text: i for i, text in enumerate(chars)}
+            bits = bits[[rows[text] for text in self.wanted]]
+        # 黑色比例先于字符索引写入，索引存在即表示缓存完整
+        with atomic_write(self.josn_path, 'w') as f:
+            json.dump({text: black_point_rates[text] for text in self.wanted}, f)
+        _save_std_im_bits(self.bits_path, self.wanted, bits, self.shape, self.manifest)
+
+
+def update_std_font_cache(std_font: ImageFont.FreeTypeFont, guest_range: list[str],
+                          bits_path: str, josn_path: str) -> tuple[int, int]:
+    """
+    按清单增量更新标准字体缓存，只绘制缓存中缺少的字符，见 StdFontCacheUpdate。
+    返回 (沿用的字符数, 新绘制的字符数)。
+    """
+    update = StdFontCacheUpdate.load(std_font, guest_range, bits_path, josn_path)
+    if update.needs_save:
+        update.save(*render_std_chars(std_font, update.missing) if update.missing else (None, None))
+    return update.kept, len(update.missing)
+
+
+def _get_font_source(font: ImageFont.FreeTypeFont) -> str | bytes:
+    """可传给子进程、以便重新载入同一字体的路径或字体数据"""
+    if isinstance(font.path, (str, bytes)):
+        return font.path
+    font.path.seek(0)
+    return font.path.read()
+
+
+def _render_std_chunk(font_source: str | bytes, font_size: int,
+                      chars: list[str]) -> tuple[np.ndarray, list[float], float]:
+    """子进程中绘制一段字符，返回位图、黑色比例及所用时间"""
+    start = time.perf_counter()
+    if isinstance(font_source, bytes):
+        std_font = ImageFont.truetype(io.BytesIO(font_source), size=font_size)
+    else:
+        std_font = _load_font(font_source, font_size)
+    bits, rates = render_std_chars(std_font, chars)
+    return bits, rates, time.perf_counter() - start
+
+
+def update_std_font_caches(std_font_dict: dict[str, ImageFont.FreeTypeFont], TRUE_FONT_PATH: str,
+                           guest_range: list[str], workers: int, chunk_size: int = STD_RENDER_CHUNK_SIZE
+                           ) -> dict[str, tuple[int, int]]:
+    """
+    以多进程并行增量更新多个标准字体的缓存：各字体缺少的字符按 chunk_size 分段，
+    所有字体的分段共用一个进程池。某字体全部分段完成后才按原顺序合并并一次写出，
+    任一分段失败时该字体缓存保持不变。返回各字体 (沿用的字符数, 新绘制的字符数)。
+    """
+    updates = {}
+    for std_font_name, std_font in std_font_dict.items():
+        BITS_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.bits.npy')
+        JSON_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.json')
+        updates[std_font_name] = StdFontCacheUpdate.load(std_font, guest_range, BITS_PATH, JSON_PATH)
+
+    chunks = {
+        std_font_name: [update.missing[i:i + chunk_size] for i in range(0, len(update.missing), chunk_size)]
+        for std_font_name, update in updates.items()
+    }
+    total = sum(len(update.missing) for update in updates.values())
+    shards = {std_font_name: [None] * len(font_chunks) for std_font_name, font_chunks in chunks.items()}
+    render_time = dict.fromkeys(updates, 0.0)
+    wall_time = dict.fromkeys(updates, 0.0)
+    start = time.perf_counter()
+
+    if total:
+        with ProcessPoolExecutor(max_workers=workers) as pool, \
+                tqdm(total=total, desc="Rendering standard fonts", unit="char") as progress:
+            futures = {}
+            for std_font_name, font_chunks in chunks.items():
+                std_font = std_font_dict[std_font_name]
+                font_source = _get_font_source(std_font)
+                for i, chunk in enumerate(font_chunks):
+                    future = pool.submit(_render_std_chunk, font_source, std_font.size, chunk)
+                    futures[future] = (std_font_name, i)
+            remaining = {std_font_name: len(font_chunks) for std_font_name, font_chunks in chunks.items()}
+            for future in as_completed(futures):
+                std_font_name, i = futures[future]
+                bits, rates, elapsed = future.result()
+                shards[std_font_name][i] = (bits, rates)
+                render_time[std_font_name] += elapsed
+                progress.update(len(rates))
+                remaining[std_font_name] -= 1
+                if remaining[std_font_name] == 0:
+                    wall_time[std_font_name] = time.perf_counter() - start
+
+    out = {}
+    for std_font_name, update in updates.items():
+        if update.needs_save:
+            font_shards = shards[std_font_name]
+            if font_shards:
+                update.save(np.concatenate([bits for bits, _ in font_shards]),
+                            [rate for _, rates in font_shards for rate in rates])
+            else:
+                update.save()
+        out[std_font_name] = (update.kept, len(update.missing))
+        if update.missing:
+            logger.info("%s: kept %d cached characters, rendered %d in %d chunks, %.1fs wall, %.1fs render",
+                        std_font_name, update.kept, len(update.missing), len(chunks[std_font_name]),
+                        wall_time[std_font_name], render_time[std_font_name])
+    if total:
+        logger.info("Rendered %d characters with %d processes in %.1fs",
+                    total, workers, time.perf_counter() - start)
+    return out
+
+
+def convert_std_im_np_arrays(npz_path: str, bits_path: str):
+    """
+    将逐字符保存的 npz 转换为按位打包格式。
+    直接读取 npz 并逐字符解压、打包，不经 load_std_im_np_arrays 的缓存，转换后即释放未打包的图像。
+    """
+    with np.load(npz_path) as std_im_np_arrays:
+        chars = list(std_im_np_arrays.keys())
+        shape = None
+        rows = []
+        for c in chars:
+            std_array = std_im_np_arrays[c]
+            shape = std_array.shape
+            rows.append(pack_black_bits(std_array))
+    _save_std_im_bits(bits_path, chars, np.stack(rows), shape)
+
+
+def exists_std_im_bits(bits_path: str) -> bool:
+    return os.path.exists(bits_path) and os.path.exists(_get_std_im_bits_index_path(bits_path))
 
-def save_std_im_black_point_rates(std_font: ImageFont.FreeTypeFont, COORD_TABLE_PATH:str, josn_path: str):
-    guest_range = list(
-        {*load_std_guest_range(COORD_TABLE_PATH), *character_list})
 
-    json_dict = {}
+def load_std_im_bits(bits_path: str) -> tuple[list[str], np.ndarray, tuple[int, int]]:
+    """以只读 mmap 方式载入按位打包的标准字体图像及其字符索引"""
+    with open(_get_std_im_bits_index_path(bits_path), 'r') as f:
+        index = json.load(f)
+    bits = np.load(bits_path, mmap_mode='r')
+    return index['chars'], bits, tuple(index['shape'])
 
-    for text in guest_range:
-        std_im = draw(text, std_font)
-        json_dict[text] = get_im_black_point_rate(std_im)
 
-    with open(josn_path, 'w') as f:
-        json.dump(json_dict, f)
+@lru_cache
+def load_std_stacked_font(bits_path: str, josn_path: str) -> StackedFont:
+    """载入按位打包的标准字体图像，供批量比较"""
+    chars, bits, shape = load_std_im_bits(bits_path)
+    return StackedFont(chars, bits, shape, load_std_im_black_point_rates(josn_path))
+
+
+class StandardFontBank:
+    """
+    标准字体位图、黑色比例及字符索引的集合，每个进程只需载入一次，
+    显式传入 match_font_1 及 extract_characters_unified_workflow 以避免逐字符重建。
+    """
+
+    def __init__(self, fonts: dict[str, StackedFont], guest_range: list[str], top_k: int | None = None):
+        self.fonts = fonts
+        self.guest_range = list(guest_range)
+        self.top_k = top_k
+        self._fonts = list(fonts.values())
+        # 候选字符在各字体中的行号只求一次
+        self._guest_rows = [font.guest_rows(self.guest_range) for font in self._fonts]
+
+    @classmethod
+    def from_cache(cls, std_font_names, TRUE_FONT_PATH, guest_range: list[str], top_k: int | None = None):
+        """由 init_true_font 生成的缓存载入"""
+        fonts = {}
+        for std_font_name in std_font_names:
+            BITS_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.bits.npy')
+            JSON_PATH = os.path.join(TRUE_FONT_PATH, std_font_name + '.json')
+            fonts[std_font_name] = load_std_stacked_font(BITS_PATH, JSON_PATH)
+        return cls(fonts, guest_range, top_k)
+
+    def match(self, test_im: Image, metrics: WorkflowMetrics | None = None) -> str:
+        """返回与测试图像最匹配的标准字符，无匹配时返回空字符串；给出 metrics 时分别记录剪枝与打分耗时"""
+        if metrics is None:
+            return match_test_array_with_rows(np.asarray(test_im), self._fonts, self._guest_rows,
+                                              self.guest_range, self.top_k)
+        with metrics.stage('fallback_prune', 1, time.thread_time):
+            test = PackedTestArray(np.asarray(test_im))
+            candidates = prune_candidates(test, self._fonts, self._guest_rows, self.top_k) \
+                if test.black_point_rate != 0 else None
+        if candidates is None:
+            return ''
+        with metrics.stage('fallback_score', 1, time.thread_time):
+            return score_candidates(test, self._fonts, candidates, self.guest_range)
+
+    def match_many(self, test_ims: list[Image], workers: int = 1,
+                   metrics: WorkflowMetrics | None = None) -> list[str]:
+        """
+        批量匹配，结果顺序与输入一致。
+        标准字体位图为只读 mmap 数组，NumPy 比较时释放 GIL，故可用线程池并行。
+        """
+        match = partial(self.match, metrics=metrics)
+        if workers <= 1:
+            return [match(test_im) for test_im in test_ims]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(match, test_ims))
+
+
+def get_im_black_point_rate(im: Image):
+    std_array = np.asarray(im)
+    std_black_array = std_array == False
+    return np.count_nonzero(std_black_array) / std_array.size
 
 
 @lru_cache
@@ -248,27 +550,61 @@ def load_std_im_black_point_rates(josn_path: str):
 
 
 def match_font_1(test_font: ImageFont.FreeTypeFont, test_font_characters: list[str],
-                 std_font, guest_range: list[str], TRUE_FONT_PATH):
+                 std_font, guest_range: list[str], TRUE_FONT_PATH,
+                 std_font_bank: StandardFontBank | None = None,
+                 outline_hashes: dict[str, str | None] | None = None,
+                 glyph_cache: GlyphCache | None = None):
     out = {}
-    print('match_font_1')
+    # 轮廓已识别过的字符直接取字形缓存结果，不再绘制比较
+    if glyph_cache is not None and outline_hashes is not None:
+        cached = glyph_cache.get_many(outline_hashes.get(c) for c in test_font_characters)
+        for test_char in test_font_characters:
+            hit = cached.get(outline_hashes.get(test_char))
+            if hit is not None:
+                out[test_char] = hit[0]
+        test_font_characters = [c for c in test_font_characters if c not in out]
+        logger.info('Glyph cache: %d hits', len(out))
+    if std_font_bank is None and test_font_characters:
+        std_font_bank = StandardFontBank.from_cache(std_font.keys(), TRUE_FONT_PATH, guest_range)
+    logger.debug('match_font_1')
+    matched = []
     for test_char in tqdm(test_font_characters, desc="Matching characters", total=len(test_font_characters)):
         # if test_char != '，':
         #     continue
         test_im = draw(test_char, test_font)
-        most_match_char = match_test_im_with_cache(
-            test_im, std_font, guest_range, TRUE_FONT_PATH)
+        most_match_char = std_font_bank.match(test_im)
         out[test_char] = most_match_char
+        matched.append(test_char)
+    if glyph_cache is not None and outline_hashes is not None:
+        glyph_cache.put_many((outline_hashes.get(c), out[c], SOURCE_IMAGE) for c in matched)
     return out
 
 
 def match_font(font_fd: IO, font_ttf: ttFont.TTFont,
-               std_font, guest_range, TRUE_FONT_PATH):
+               std_font, guest_range, TRUE_FONT_PATH,
+               std_font_bank: StandardFontBank | None = None,
+               glyph_cache: GlyphCache | None = None):
     image_font = _load_font(font_fd)
     characters = list(filter(lambda x: x != 'x', list_ttf_characters(font_ttf)))
+    outline_hashes = get_glyph_outline_hashes(font_ttf, characters) if glyph_cache is not None else None
 
     return match_font_1(
         image_font, characters,
-        std_font, guest_range, TRUE_FONT_PATH
+        std_font, guest_range, TRUE_FONT_PATH,
+        std_font_bank, outline_hashes, glyph_cache
+    )
+
+
+def match_loaded_font(font: LoadedFont, std_font, guest_range, TRUE_FONT_PATH,
+                      std_font_bank: StandardFontBank | None = None,
+                      glyph_cache: GlyphCache | None = None):
+    """同 match_font，但复用已解析的 LoadedFont"""
+    characters = list(filter(lambda x: x != 'x', list_ttf_characters(font.ttf)))
+
+    return match_font_1(
+        font.pil_font(FONT_SIZE), characters,
+        std_font, guest_range, TRUE_FONT_PATH,
+        std_font_bank, font.outline_hashes if glyph_cache is not None else None, glyph_cache
     )
 
 
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+from PIL import Image
+
+from slow import getbbox
+
+
+def getbbox_per_pixel(image: Image.Image):
+    """向量化之前的逐像素实现，作为 getbbox 的回归基准"""
+    pixels = image.load()  # 加载像素数据
+    width, height = image.size
+    x1 = width
+    y1 = height
+    x2 = -1
+    y2 = -1
+
+    for x in range(width):
+        for y in range(height):
+            if pixels[x, y] == 0:  # Assuming black is represented by 0
+                x1 = min(x1, x)
+                y1 = min(y1, y)
+                x2 = max(x2, x)
+                y2 = max(y2, y)
+    if x1 == width:
+        x1 = 0
+    if y1 == height:
+        y1 = 0
+    if x2 == -1:
+        x2 = width - 1
+    if y2 == -1:
+        y2 = height - 1
+    len = max(x2 - x1, max(0, y2 - y1)) // 2
+    xmid = (x1 + x2) // 2
+    ymid = (y1 + y2) // 2
+    x1 = max(xmid - len, 0)
+    y1 = max(ymid - len, 0)
+    x2 = min(xmid + len, width - 1)
+    y2 = min(ymid + len, height - 1)
+    return x1, y1, x2, y2
+
+
+def _image(size, black_points=(), mode="1", fill="white"):
+    image = Image.new(mode, size, fill)
+    for point in black_points:
+        image.putpixel(point, 0)
+    return image
+
+
+class GetBBoxTest(unittest.TestCase):
+
+    def assertMatchesOracle(self, image):
+        self.assertEqual(getbbox(image), getbbox_per_pixel(image))
+
+    def test_blank(self):
+        for size in [(116, 116), (40, 17), (1, 1)]:
+            self.assertMatchesOracle(_image(size))
+
+    def test_full_black(self):
+        for size in [(116, 116), (40, 17), (1, 1)]:
+            self.assertMatchesOracle(_image(size, fill="black"))
+
+    def test_non_square(self):
+        self.assertMatchesOracle(_image((60, 20), [(5, 3), (50, 18)]))
+        self.assertMatchesOracle(_image((20, 60), [(2, 10), (3, 55)]))
+        self.assertMatchesOracle(_image((80, 30), [(40, 15)]))
+
+    def test_corner_pixels(self):
+        width, height = 50, 31
+        corners = [(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)]
+        for corner in corners:
+            self.assertMatchesOracle(_image((width, height), [corner]))
+        for i in range(len(corners)):
+            for j in range(i + 1, len(corners)):
+                self.assertMatchesOracle(_image((width, height), [corners[i], corners[j]]))
+
+    def test_grayscale(self):
+        self.assertMatchesOracle(_image((30, 30), [(3, 4), (20, 25)], mode="L", fill=255))
+
+    def test_random(self):
+        rng = random.Random(0)
+        for _ in range(100):
+            size = (rng.randint(1, 60), rng.randint(1, 60))
+            points = [(rng.randrange(size[0]), rng.randrange(size[1])) for _ in range(rng.randint(0, 6))]
+            self.assertMatchesOracle(_image(size, points))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,10 @@
-import io
 import os
 from typing import Union
 
 
-from commonly_used_character import character_list_7000 as character_list
 from slow import (
     load_Font,
-    load_std_guest_range, match_font, match_font, init_true_font
+    _get_std_guest_range, match_loaded_font, init_true_font
 )
 from lib import  get_font
 
@@ -20,13 +18,11 @@ async def match_font_tool(font_path, TRUE_FONT_PATH, true_font, COORD_TABLE_PATH
         )
     init_true_font(std_font_dict, TRUE_FONT_PATH, COORD_TABLE_PATH)
     # guest_range = load_std_guest_range(COORD_TABLE_PATH)
-    guest_range = list(
-        {*load_std_guest_range(COORD_TABLE_PATH), *character_list})
-    with io.BytesIO(font.get('bytes')) as font_fd:
-        table = match_font(
-            font_fd, font.get('ttf'),
-            std_font_dict, guest_range, TRUE_FONT_PATH
-        )
-        return table
+    guest_range = _get_std_guest_range(COORD_TABLE_PATH)
+    table = match_loaded_font(
+        font.get('font'),
+        std_font_dict, guest_range, TRUE_FONT_PATH
+    )
+    return table
 
 